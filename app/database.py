@@ -1,8 +1,10 @@
 """
 Database initialization and configuration
 """
+import threading
 import pymysql
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine
 
 # Install PyMySQL as MySQLdb
 # This is needed for compatibility with SQLAlchemy
@@ -11,6 +13,30 @@ pymysql.install_as_MySQLdb()
 # Initialize SQLAlchemy instance
 db = SQLAlchemy()
 
+# Engine bersama untuk background services (DatabaseMonitor, LaporanShiftService)
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+def get_shared_engine(config):
+    """
+    Get singleton engine for background services
+    Long-lived pool: pre_ping menjaga koneksi stale, recycle 30 menit
+    """
+    global _shared_engine
+    if _shared_engine is None:
+        with _shared_engine_lock:
+            if _shared_engine is None:
+                _shared_engine = create_engine(
+                    config.SQLALCHEMY_DATABASE_URI,
+                    pool_pre_ping=True,
+                    pool_recycle=1800,
+                    pool_size=2,
+                    max_overflow=2,
+                    pool_timeout=10,
+                    echo=False
+                )
+    return _shared_engine
+
 def init_db(app):
     """Initialize database with Flask app"""
     db.init_app(app)
@@ -18,4 +44,17 @@ def init_db(app):
     with app.app_context():
         # Create all tables
         db.create_all()
-        print("Database tables created successfully")
\ No newline at end of file
+        print("Database tables created successfully")
+        
+        # create_all tidak menambahkan index ke tabel yang sudah ada
+        ensure_indexes()
+
+def ensure_indexes():
+    """Create missing indexes on existing tables (tidak ada migration tool)"""
+    from app.models.log_tugas import LogTugas
+    
+    for index in LogTugas.__table__.indexes:
+        try:
+            index.create(db.engine, checkfirst=True)
+        except Exception as e:
+            print(f"Warning: could not create index {index.name}: {e}")
@@ -3,6 +3,10 @@ from datetime import datetime
 
 class LogTugas(db.Model):
     __tablename__ = 'log_tugas'
+    __table_args__ = (
+        # Covering index untuk query laporan shift (filter created_at, join user_id, group nama_tugas)
+        db.Index('idx_log_tugas_created_user', 'created_at', 'user_id', 'nama_tugas'),
+    )
     
     id = db.Column(db.BigInteger, primary_key=True, autoincrement=True)
     nama_tugas = db.Column(db.String(255), nullable=False)
@@ -6,6 +6,12 @@ import shutil
 from datetime import datetime
 from typing import List, Dict
 
+try:
+    import pyarrow as pa  # Optional: Arrow IPC output (ENABLE_ARROW_OUTPUT)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 logger = logging.getLogger(__name__)
 
 class CSVManager:
@@ -26,6 +32,20 @@ class CSVManager:
             'ping_success', 'response_time_ms', 'latency_ms', 'error_message',
             'merk', 'os', 'kondisi', 'id_lokasi'
         ]
+        
+        # Optional Arrow IPC output next to the CSV (typed columns, cheap read-back)
+        self.arrow_enabled = getattr(config, 'ENABLE_ARROW_OUTPUT', False)
+        if self.arrow_enabled and not HAS_PYARROW:
+            logger.warning("ENABLE_ARROW_OUTPUT enabled but pyarrow is not installed - Arrow output disabled")
+            self.arrow_enabled = False
+        
+        if self.arrow_enabled:
+            self.arrow_schema = pa.schema([
+                ('ip', pa.string()),
+                ('timestamp', pa.timestamp('ms')),
+                ('rtt_ms', pa.float32()),
+                ('alive', pa.bool_())
+            ])
     
     # def write_ping_results_to_csv(self, results: List[Dict], active_ips: List[str] = None):
     #     """
@@ -98,13 +118,16 @@ class CSVManager:
             return results
         
         try:
+            # File di-append tiap cycle dan hanya di-compact berkala,
+            # jadi satu IP bisa muncul beberapa kali: ambil baris terakhir per IP
+            latest_by_ip = {}
             with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
                 reader = csv.DictReader(csvfile)
-                
-                # Since we now update in place, each IP appears only once
-                # So we can just read all rows
                 for row in reader:
-                    results.append(dict(row))
+                    if row.get('ip_address'):
+                        latest_by_ip[row['ip_address']] = row
+            
+            results = list(latest_by_ip.values())
                     
             # Apply limit if specified
             if limit:
@@ -139,11 +162,11 @@ class CSVManager:
                     except ValueError:
                         file_date = 'Unknown'
                     
-                    # Count lines in CSV (excluding header)
+                    # Count unique IPs (file bisa berisi beberapa baris per IP sebelum di-compact)
                     line_count = 0
                     try:
-                        with open(file_path, 'r') as f:
-                            line_count = sum(1 for line in f) - 1  # Exclude header
+                        with open(file_path, 'r', newline='', encoding='utf-8') as f:
+                            line_count = len({row.get('ip_address') for row in csv.DictReader(f)})
                     except Exception:
                         line_count = 0
                     
@@ -185,7 +208,8 @@ class CSVManager:
             deleted_files = 0
             
             for filename in os.listdir(self.csv_dir):
-                if filename.startswith('ping_results_') and filename.endswith('.csv'):
+                if (filename.startswith('ping_results_') and filename.endswith('.csv')) or \
+                   (filename.startswith('pings_') and filename.endswith('.arrow')):
                     file_path = os.path.join(self.csv_dir, filename)
                     file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
                     
@@ -231,6 +255,108 @@ class CSVManager:
         
 
 
+    def append_ping_results(self, results: List[Dict]):
+        """
+        Append ping results of one cycle to today's CSV file
+        Tidak membaca/menulis ulang file; compaction dilakukan oleh prune_inactive_ips
+        """
+        csv_path = self.get_csv_file_path()
+        
+        try:
+            write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+            
+            with open(csv_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.csv_headers, extrasaction='ignore')
+                if write_header:
+                    writer.writeheader()
+                writer.writerows(results)
+            
+            logger.debug(f"Appended {len(results)} ping results to {os.path.basename(csv_path)}")
+            
+        except Exception as e:
+            logger.error(f"GAGAL append CSV: {e}")
+            raise
+        
+        if self.arrow_enabled:
+            self.write_ping_results_to_arrow(results)
+    
+    def to_csv_row(self, result: Dict) -> Dict[str, str]:
+        """
+        Hasil ping in-memory -> baris seperti yang dibaca kembali dari CSV (semua nilai string,
+        None jadi '') agar pembaca memory dan pembaca file melihat format yang sama
+        """
+        return {field: '' if result.get(field) is None else str(result[field]) for field in self.csv_headers}
+    
+    def get_arrow_file_path(self, date_str: str = None) -> str:
+        """
+        Get Arrow file path for specific date or today
+        """
+        if date_str is None:
+            date_str = datetime.now().strftime('%Y%m%d')
+        
+        return os.path.join(self.csv_dir, f"pings_{date_str}.arrow")
+    
+    def write_ping_results_to_arrow(self, results: List[Dict]):
+        """
+        Append one cycle as a RecordBatch to today's Arrow file
+        Tiap cycle ditulis sebagai IPC stream lengkap (schema + batch + EOS) sehingga
+        file bisa di-append tanpa menulis ulang, dan crash hanya merusak cycle terakhir
+        """
+        try:
+            batch = pa.record_batch([
+                pa.array([r['ip_address'] for r in results], type=pa.string()),
+                pa.array([datetime.fromisoformat(r['timestamp']) for r in results], type=pa.timestamp('ms')),
+                pa.array([r['response_time_ms'] for r in results], type=pa.float32()),
+                pa.array([bool(r['ping_success']) for r in results], type=pa.bool_())
+            ], schema=self.arrow_schema)
+            
+            with pa.OSFile(self.get_arrow_file_path(), 'ab') as sink:
+                with pa.ipc.new_stream(sink, self.arrow_schema) as writer:
+                    writer.write_batch(batch)
+                    
+        except Exception as e:
+            logger.error(f"GAGAL tulis Arrow: {e}")
+    
+    def get_latest_ping_results_from_arrow(self, limit: int = None) -> List[Dict]:
+        """
+        Get latest ping result per IP from today's Arrow file
+        """
+        arrow_path = self.get_arrow_file_path()
+        
+        if not self.arrow_enabled or not os.path.exists(arrow_path):
+            return []
+        
+        try:
+            tables = []
+            with pa.memory_map(arrow_path) as source:
+                # File berisi beberapa IPC stream berurutan (satu per cycle)
+                while source.tell() < source.size():
+                    try:
+                        tables.append(pa.ipc.open_stream(source).read_all())
+                    except pa.ArrowInvalid as e:
+                        logger.warning(f"Arrow file has an incomplete trailing cycle, ignored: {e}")
+                        break
+            
+            if not tables:
+                return []
+            
+            latest_by_ip = {}
+            for row in pa.concat_tables(tables).to_pylist():
+                latest_by_ip[row['ip']] = row
+            
+            results = list(latest_by_ip.values())
+            return results[:limit] if limit else results
+            
+        except Exception as e:
+            logger.error(f"Error reading Arrow file: {e}")
+            return []
+    
+    def prune_inactive_ips(self, active_ips: List[str]):
+        """
+        Compact today's CSV to one row per IP and drop IPs that are no longer active
+        """
+        self.write_ping_results_to_csv([], active_ips=active_ips)
+    
     def write_ping_results_to_csv(self, results: List[Dict], active_ips: List[str] = None):
         timestamp = datetime.now()
         csv_filename = f"ping_results_{timestamp.strftime('%Y%m%d')}.csv"
@@ -261,8 +387,9 @@ class CSVManager:
 
             # Prune kalau perlu
             if active_ips is not None:
+                active_set = set(active_ips)
                 for ip in list(existing_data.keys()):
-                    if ip not in active_ips:
+                    if ip not in active_set:
                         existing_data.pop(ip, None)
 
             # Update dengan hasil terbaru
@@ -3,8 +3,9 @@ import hashlib
 import logging
 from datetime import datetime
 from typing import Dict
+from sqlalchemy import func
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from app.database import get_shared_engine
 from app.models.inventaris import Inventaris
 from app.models.jenis_barang import JenisBarang
 
@@ -18,20 +19,21 @@ class DatabaseMonitor:
     def __init__(self, config):
         self.config = config
         
-        # Setup database connection dengan thread-safe session
-        self.engine = create_engine(
-            config.SQLALCHEMY_DATABASE_URI,
-            pool_pre_ping=True,
-            pool_recycle=300,
-            echo=False
-        )
+        # Setup database connection dengan thread-safe session (engine dipakai bersama)
+        self.engine = get_shared_engine(config)
         self.Session = sessionmaker(bind=self.engine)
         
         # Database monitoring configuration
         self.device_cache = {}  # Cache untuk device list
+        self.active_ips = ()  # IP dari device cache, di-update saat reload_device_list
         self.last_device_check = time.time()
         self.device_check_interval = getattr(config, 'DEVICE_CHECK_INTERVAL', 30)  # Check setiap 30 detik
         self.database_change_count = 0
+        
+        # Fingerprint murah (COUNT/SUM/MAX) dicek tiap interval; signature penuh hanya saat
+        # fingerprint berubah atau tiap N check (menangkap update yang tidak menyentuh updated_at)
+        self.full_check_every = getattr(config, 'DEVICE_FULL_CHECK_EVERY', 20)
+        self._checks_since_full = 0
     
     def get_current_device_signature(self) -> str:
         """
@@ -41,22 +43,27 @@ class DatabaseMonitor:
         session = self.Session()
         try:
             # Join dengan jenis_barangs dan filter hanya yang bisa di-ping
-            devices = session.query(Inventaris).join(
+            # Hanya ambil kolom yang dipakai dan stream hasilnya (tidak load semua row sekaligus)
+            rows = session.query(
+                Inventaris.id, Inventaris.ip, Inventaris.hostname, Inventaris.kondisi
+            ).join(
                 JenisBarang, Inventaris.jenis_barang_id == JenisBarang.id
             ).filter(
                 Inventaris.kondisi != 'hilang',
                 Inventaris.ip.isnot(None),
                 Inventaris.ip != '',
                 JenisBarang.ping == 1  # Filter: hanya yang bisa di-ping
-            ).order_by(Inventaris.id).all()
+            ).order_by(Inventaris.id).execution_options(stream_results=True).yield_per(1000)
             
-            # Create signature dari device list
-            device_data = []
-            for device in devices:
-                device_data.append(f"{device.id}:{device.ip}:{device.hostname}:{device.kondisi}")
+            # Create signature dari device list (hash di-update per row)
+            digest = hashlib.md5()
+            separator = b""
+            for row in rows:
+                digest.update(separator)
+                digest.update(f"{row.id}:{row.ip}:{row.hostname}:{row.kondisi}".encode())
+                separator = b"|"
             
-            signature = hashlib.md5("|".join(device_data).encode()).hexdigest()
-            return signature
+            return digest.hexdigest()
             
         except Exception as e:
             logger.error(f"Error generating device signature: {e}")
@@ -64,6 +71,34 @@ class DatabaseMonitor:
         finally:
             session.close()
     
+    def get_device_fingerprint(self) -> str:
+        """
+        Cheap dirty check untuk device list: satu aggregate row, bukan semua device
+        """
+        session = self.Session()
+        try:
+            row = session.query(
+                func.count(Inventaris.id),
+                func.sum(Inventaris.id),
+                func.max(Inventaris.updated_at),
+                func.max(JenisBarang.updated_at)
+            ).join(
+                JenisBarang, Inventaris.jenis_barang_id == JenisBarang.id
+            ).filter(
+                Inventaris.kondisi != 'hilang',
+                Inventaris.ip.isnot(None),
+                Inventaris.ip != '',
+                JenisBarang.ping == 1  # Filter: hanya yang bisa di-ping
+            ).one()
+            
+            return "|".join(str(value) for value in row)
+            
+        except Exception as e:
+            logger.error(f"Error generating device fingerprint: {e}")
+            return ""
+        finally:
+            session.close()
+    
     def check_database_changes(self) -> bool:
         """
         Check apakah ada perubahan di database sejak last check
@@ -76,11 +111,21 @@ class DatabaseMonitor:
             return False
             
         try:
+            fingerprint = self.get_device_fingerprint()
+            self.last_device_check = current_time
+            self._checks_since_full += 1
+            
+            # Fingerprint sama: skip query signature penuh (kecuali jadwal full check)
+            if fingerprint and fingerprint == self.device_cache.get('fingerprint') \
+                    and self._checks_since_full < self.full_check_every:
+                return False
+            
+            self.device_cache['fingerprint'] = fingerprint
+            self._checks_since_full = 0
+            
             current_signature = self.get_current_device_signature()
             last_signature = self.device_cache.get('signature', '')
             
-            self.last_device_check = current_time
-            
             if current_signature != last_signature:
                 logger.info("Database changes detected!")
                 logger.info(f"Old signature: {last_signature[:16]}...")
@@ -131,6 +176,7 @@ class DatabaseMonitor:
             
             old_count = len(self.device_cache.get('devices', {}))
             self.device_cache['devices'] = device_dict
+            self.active_ips = tuple(d['ip'] for d in device_dict.values() if d['ip'])
             new_count = len(device_dict)
             
             logger.info(f"Device list reloaded: {old_count} -> {new_count} devices (ping enabled only)")
@@ -224,6 +270,7 @@ class DatabaseMonitor:
             new_count = self.reload_device_list()
             
             # Update signature
+            self.device_cache['fingerprint'] = self.get_device_fingerprint()
             self.device_cache['signature'] = self.get_current_device_signature()
             self.database_change_count += 1
             
@@ -247,13 +294,6 @@ class DatabaseMonitor:
         Initialize device cache pada startup
         """
         self.reload_device_list()
+        self.device_cache['fingerprint'] = self.get_device_fingerprint()
         self.device_cache['signature'] = self.get_current_device_signature()
         logger.info("Database monitor initialized with device cache")
-    
-    def __del__(self):
-        """
-        Cleanup resources
-        """
-        # Engine akan otomatis cleanup connections
-        if hasattr(self, 'engine'):
-            self.engine.dispose()
\ No newline at end of file
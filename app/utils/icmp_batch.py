@@ -0,0 +1,159 @@
+"""
+ICMP Batch Pinger - kirim Echo Request ke banyak host lewat satu socket ICMP
+Socket dibuka sekali dan dipakai ulang antar cycle; reply di-demux berdasarkan sequence number
+"""
+import os
+import time
+import select
+import socket
+import struct
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_HEADER_FORMAT = '!BBHHH'
+ICMP_HEADER_SIZE = 8
+RECV_BUFFER_SIZE = 1024
+
+
+def _checksum(data: bytes) -> int:
+    """Internet checksum (RFC 1071)"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+class ICMPBatchPinger:
+    """
+    Ping banyak IP dalam satu batch dengan satu socket ICMP (Linux)
+    privileged=False memakai SOCK_DGRAM (butuh net.ipv4.ping_group_range), True memakai SOCK_RAW
+    """
+    
+    def __init__(self, privileged: bool = False):
+        self.privileged = privileged
+        self.identifier = os.getpid() & 0xFFFF
+        self._sequence = 0
+        self._sock = None
+    
+    def _get_socket(self) -> socket.socket:
+        """Buka socket sekali, dipakai ulang di cycle berikutnya"""
+        if self._sock is None:
+            sock_type = socket.SOCK_RAW if self.privileged else socket.SOCK_DGRAM
+            self._sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+            self._sock.setblocking(False)
+        return self._sock
+    
+    def _next_sequence(self) -> int:
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        return self._sequence
+    
+    def _build_packet(self, sequence: int) -> bytes:
+        payload = struct.pack('!d', time.time())
+        header = struct.pack(ICMP_HEADER_FORMAT, ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        checksum = _checksum(header + payload)
+        header = struct.pack(ICMP_HEADER_FORMAT, ICMP_ECHO_REQUEST, 0, checksum, self.identifier, sequence)
+        return header + payload
+    
+    def _drain(self, sock: socket.socket):
+        """Buang reply terlambat dari cycle sebelumnya"""
+        while True:
+            try:
+                sock.recvfrom(RECV_BUFFER_SIZE)
+            except (BlockingIOError, InterruptedError):
+                return
+    
+    def _send(self, sock: socket.socket, packet: bytes, address: str, deadline: float) -> bool:
+        """
+        Kirim satu packet di socket non-blocking; jika send buffer penuh (EAGAIN) tunggu socket
+        writable lalu kirim ulang. False hanya jika tetap tidak bisa dikirim sampai deadline
+        """
+        while True:
+            try:
+                sock.sendto(packet, (address, 0))
+                return True
+            except (BlockingIOError, InterruptedError):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                select.select([], [sock], [], remaining)
+    
+    def ping_batch(self, ips: List[str], timeout: float) -> Dict[str, Optional[float]]:
+        """
+        Ping semua IP sekaligus
+        Returns {ip: rtt_ms} untuk host yang reply, None untuk yang timeout/gagal kirim
+        """
+        sock = self._get_socket()
+        self._drain(sock)
+        
+        results: Dict[str, Optional[float]] = {ip: None for ip in ips}
+        pending: Dict[int, tuple] = {}  # sequence -> (ip, resolved address, send_time)
+        
+        # Kirim semua Echo Request dalam satu loop; burst besar bisa memenuhi send buffer,
+        # tunggu writable (dibatasi timeout) agar host tidak salah dilaporkan timeout
+        send_deadline = time.monotonic() + timeout
+        for ip in ips:
+            sequence = self._next_sequence()
+            try:
+                address = socket.gethostbyname(ip)  # IP literal tidak memicu DNS lookup
+                if self._send(sock, self._build_packet(sequence), address, send_deadline):
+                    pending[sequence] = (ip, address, time.monotonic())
+                else:
+                    logger.warning(f"ICMP send buffer full until timeout - {ip} not pinged this cycle")
+            except OSError as e:
+                logger.debug(f"ICMP send failed for {ip}: {e}")
+        
+        # Kumpulkan reply sampai semua terjawab atau timeout
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            readable, _, _ = select.select([sock], [], [], remaining)
+            if not readable:
+                break
+            
+            while True:
+                try:
+                    packet, address = sock.recvfrom(RECV_BUFFER_SIZE)
+                except (BlockingIOError, InterruptedError):
+                    break
+                
+                received_at = time.monotonic()
+                
+                # SOCK_RAW menyertakan IP header, SOCK_DGRAM tidak
+                offset = (packet[0] & 0x0F) * 4 if self.privileged else 0
+                if len(packet) < offset + ICMP_HEADER_SIZE:
+                    continue
+                
+                icmp_type, _, _, identifier, sequence = struct.unpack(
+                    ICMP_HEADER_FORMAT, packet[offset:offset + ICMP_HEADER_SIZE]
+                )
+                if icmp_type != ICMP_ECHO_REPLY:
+                    continue
+                
+                # SOCK_RAW menerima semua reply di host ini: cocokkan identifier kita
+                # (SOCK_DGRAM: kernel sudah memfilter dan mengganti identifier)
+                if self.privileged and identifier != self.identifier:
+                    continue
+                
+                entry = pending.get(sequence)
+                if entry is None or entry[1] != address[0]:
+                    continue
+                
+                ip, _, sent_at = pending.pop(sequence)
+                results[ip] = (received_at - sent_at) * 1000
+        
+        return results
+    
+    def close(self):
+        """Tutup socket"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
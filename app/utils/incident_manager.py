@@ -4,8 +4,10 @@ Incident Manager - Menangani pembuatan insiden untuk device yang timeout berkepa
 import os
 import csv
 import logging
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+from flask import has_app_context
 from app.database import db
 from app.models.instidens import Instidens
 from app.models.inventaris import Inventaris
@@ -28,6 +30,11 @@ class IncidentManager:
         # Configuration
         self.incident_threshold_minutes = getattr(config, 'INCIDENT_THRESHOLD_MINUTES', 60)  # 1 hour
         self.check_interval_minutes = getattr(config, 'INCIDENT_CHECK_INTERVAL_MINUTES', 10)  # Check every 10 minutes
+        self._incident_threshold_td = timedelta(minutes=self.incident_threshold_minutes)
+        
+        # Cache parsed first_timeout per IP: {ip: (first_timeout_str, datetime)}
+        # timeout_data entries live for many cycles, so the same string is parsed repeatedly otherwise
+        self._iso_cache: Dict[str, tuple] = {}
         
         # Ensure directory exists
         os.makedirs(self.timeout_dir, exist_ok=True)
@@ -113,6 +120,13 @@ class IncidentManager:
         except Exception as e:
             logger.error(f"Error writing incident tracking CSV: {e}")
     
+    def _get_tracking_mtime(self) -> Optional[float]:
+        """Get modification time of incident tracking CSV (None if missing)"""
+        try:
+            return os.path.getmtime(self.incident_tracking_csv)
+        except OSError:
+            return None
+    
     def _get_device_info(self, ip_address: str, hostname: str = None, device_id: str = None) -> Dict:
         """Get device information from database"""
         try:
@@ -127,30 +141,40 @@ class IncidentManager:
                     'jenis_barang_id': None
                 }
             
-            # Use Flask app context for database queries
-            with self.app.app_context():
-                # Try to find device by IP
-                device = Inventaris.query.filter_by(ip=ip_address).first()
-                
-                if device:
-                    return {
-                        'device_id': device.id,
-                        'hostname': device.hostname or hostname or 'Unknown',
-                        'ip_address': device.ip,
-                        'merk': device.merk or 'Unknown',
-                        'os': device.os or 'Unknown',
-                        'jenis_barang_id': device.jenis_barang_id
-                    }
-                else:
-                    # Device not found in database, use provided info
-                    return {
-                        'device_id': device_id if device_id else None,
-                        'hostname': hostname or 'Unknown',
-                        'ip_address': ip_address,
-                        'merk': 'Unknown',
-                        'os': 'Unknown',
-                        'jenis_barang_id': None
-                    }
+            # App context is pushed once per batch by check_and_create_incidents
+            if not has_app_context():
+                logger.error(f"_get_device_info called without an active app context - using minimal device info for {ip_address}")
+                return {
+                    'device_id': device_id if device_id else None,
+                    'hostname': hostname or 'Unknown',
+                    'ip_address': ip_address,
+                    'merk': 'Unknown',
+                    'os': 'Unknown',
+                    'jenis_barang_id': None
+                }
+            
+            # Try to find device by IP
+            device = Inventaris.query.filter_by(ip=ip_address).first()
+            
+            if device:
+                return {
+                    'device_id': device.id,
+                    'hostname': device.hostname or hostname or 'Unknown',
+                    'ip_address': device.ip,
+                    'merk': device.merk or 'Unknown',
+                    'os': device.os or 'Unknown',
+                    'jenis_barang_id': device.jenis_barang_id
+                }
+            else:
+                # Device not found in database, use provided info
+                return {
+                    'device_id': device_id if device_id else None,
+                    'hostname': hostname or 'Unknown',
+                    'ip_address': ip_address,
+                    'merk': 'Unknown',
+                    'os': 'Unknown',
+                    'jenis_barang_id': None
+                }
                 
         except Exception as e:
             logger.error(f"Error getting device info for {ip_address}: {e}")
@@ -164,14 +188,22 @@ class IncidentManager:
             }
     
     def _create_incident(self, device_info: Dict, alert_time: datetime) -> Optional[int]:
-        """Create incident in database - using only existing table columns"""
+        """
+        Create incident in database - using only existing table columns
+        The incident is flushed inside a savepoint; the caller commits the whole batch
+        """
         try:
             if not self.app:
                 logger.error("Cannot create incident - No Flask app available")
                 return None
             
-            # Use Flask app context for database operations
-            with self.app.app_context():
+            # App context is pushed once per batch by check_and_create_incidents
+            if not has_app_context():
+                logger.error("Cannot create incident - _create_incident called without an active app context")
+                return None
+            
+            # Savepoint so a failed insert does not discard the rest of the batch
+            with db.session.begin_nested():
                 # Determine device type description
                 device_type = f"{device_info.get('merk', 'Unknown')} {device_info.get('os', 'Device')}"
                 hostname = device_info.get('hostname', 'Unknown')
@@ -210,18 +242,13 @@ class IncidentManager:
                 )
                 
                 db.session.add(incident)
-                db.session.commit()
-                
-                logger.info(f"✅ Incident created successfully for {hostname} ({ip_address}) - ID: {incident.id}")
-                print(f"   📋 Incident ID {incident.id} dibuat untuk {hostname} ({ip_address})")
-                
-                return incident.id
+            
+            logger.info(f"✅ Incident created successfully for {hostname} ({ip_address}) - ID: {incident.id}")
+            
+            return incident.id
             
         except Exception as e:
             logger.error(f"❌ Error creating incident for {device_info.get('ip_address')}: {e}")
-            if self.app:
-                with self.app.app_context():
-                    db.session.rollback()
             import traceback
             logger.error(f"   Traceback: {traceback.format_exc()}")
             return None
@@ -244,35 +271,50 @@ class IncidentManager:
             # Read alerted devices and existing incidents
             incident_tracking = self._read_incident_tracking()
             
-            # Check each device in timeout_data
-            for ip_address, device_data in timeout_data.items():
-                # Skip if incident already created for this device
-                if ip_address in incident_tracking:
-                    logger.debug(f"Incident already exists for {ip_address}, skipping")
-                    continue
+            # Only devices without a tracked incident are candidates
+            candidates = timeout_data.keys() - incident_tracking.keys()
+            
+            # Evict cached datetimes for IPs that left the timeout set without a recovery
+            # (reset, cleanup_timeout_csv, device removed from inventory)
+            if self._iso_cache.keys() - timeout_data.keys():
+                self._iso_cache = {ip: cached for ip, cached in self._iso_cache.items() if ip in timeout_data}
+            
+            # Collect devices whose timeout has reached the threshold
+            threshold_reached = []
+            for ip_address in candidates:
+                device_data = timeout_data[ip_address]
                 
                 # Get first timeout time
                 first_timeout = device_data.get('first_timeout')
                 if not first_timeout:
                     continue
                 
-                try:
-                    first_timeout_dt = datetime.fromisoformat(first_timeout)
-                except:
-                    logger.warning(f"Invalid first_timeout format for {ip_address}: {first_timeout}")
-                    continue
-                
-                # Calculate time difference
-                time_diff = current_time - first_timeout_dt
-                time_diff_minutes = time_diff.total_seconds() / 60
+                cached = self._iso_cache.get(ip_address)
+                if cached is not None and cached[0] == first_timeout:
+                    first_timeout_dt = cached[1]
+                else:
+                    try:
+                        first_timeout_dt = datetime.fromisoformat(first_timeout)
+                    except:
+                        logger.warning(f"Invalid first_timeout format for {ip_address}: {first_timeout}")
+                        continue
+                    self._iso_cache[ip_address] = (first_timeout, first_timeout_dt)
                 
                 # Check if threshold reached
-                if time_diff_minutes >= self.incident_threshold_minutes:
-                    logger.warning(f"🚨 Device {ip_address} has been down for {time_diff_minutes:.1f} minutes (threshold: {self.incident_threshold_minutes})")
-                    print(f"\n🚨 INCIDENT THRESHOLD REACHED!")
-                    print(f"   Device: {device_data.get('hostname', 'Unknown')} ({ip_address})")
-                    print(f"   Down time: {time_diff_minutes:.1f} minutes (threshold: {self.incident_threshold_minutes} minutes)")
-                    print(f"   Creating incident...")
+                time_diff = current_time - first_timeout_dt
+                if time_diff >= self._incident_threshold_td:
+                    threshold_reached.append((ip_address, device_data, first_timeout_dt, time_diff))
+            
+            if not threshold_reached:
+                return created_incidents
+            
+            # Push the app context (and its db.session scope) once for the whole batch
+            app_ctx = self.app.app_context() if self.app else nullcontext()
+            with app_ctx:
+                for ip_address, device_data, first_timeout_dt, time_diff in threshold_reached:
+                    time_diff_minutes = time_diff.total_seconds() / 60
+                    logger.warning(f"🚨 INCIDENT THRESHOLD REACHED: {device_data.get('hostname', 'Unknown')} ({ip_address}) "
+                                   f"down for {time_diff_minutes:.1f} minutes (threshold: {self.incident_threshold_minutes}) - creating incident")
                     
                     # Get full device info
                     device_info = self._get_device_info(
@@ -297,9 +339,17 @@ class IncidentManager:
                         }
                         
                         created_incidents.append(incident_id)
-                        print(f"   ✅ Incident ID {incident_id} berhasil dibuat!")
                     else:
-                        print(f"   ❌ Gagal membuat incident!")
+                        logger.warning(f"❌ Gagal membuat incident untuk {ip_address}")
+                
+                # Commit all incidents of this batch at once
+                if created_incidents:
+                    try:
+                        db.session.commit()
+                    except Exception as e:
+                        db.session.rollback()
+                        logger.error(f"❌ Error committing {len(created_incidents)} incidents: {e}")
+                        return []
             
             # Update incident tracking CSV
             if created_incidents:
@@ -326,12 +376,13 @@ class IncidentManager:
             updated = False
             
             for ip_address in recovered_ips:
+                self._iso_cache.pop(ip_address, None)
+                
                 if ip_address in incident_tracking:
                     incident_id = incident_tracking[ip_address].get('incident_id')
                     hostname = incident_tracking[ip_address].get('hostname', ip_address)
                     
-                    logger.info(f"Device {hostname} ({ip_address}) recovered - Removing from incident tracking")
-                    print(f"   🔄 Device {hostname} pulih - Incident ID {incident_id} dapat ditutup")
+                    logger.info(f"Device {hostname} ({ip_address}) recovered - Incident ID {incident_id} dapat ditutup, removing from incident tracking")
                     
                     del incident_tracking[ip_address]
                     updated = True
@@ -342,18 +393,27 @@ class IncidentManager:
         except Exception as e:
             logger.error(f"Error cleaning up resolved incidents: {e}")
     
-    def get_incident_summary(self) -> Dict:
-        """Get summary of incident tracking"""
+    def get_incident_summary(self, include_list: bool = False) -> Dict:
+        """
+        Get summary of incident tracking
+        
+        Args:
+            include_list: Include every tracked incident in the result (default: counts only)
+        """
         try:
             incident_tracking = self._read_incident_tracking()
             
-            return {
+            summary = {
                 'total_incidents_created': len(incident_tracking),
                 'threshold_minutes': self.incident_threshold_minutes,
                 'check_interval_minutes': self.check_interval_minutes,
                 'tracking_csv_path': self.incident_tracking_csv,
-                'incidents': list(incident_tracking.values())
+                'last_modified': self._get_tracking_mtime()
             }
+            if include_list:
+                summary['incidents'] = list(incident_tracking.values())
+            
+            return summary
             
         except Exception as e:
             logger.error(f"Error getting incident summary: {e}")
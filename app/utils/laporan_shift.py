@@ -3,17 +3,36 @@ Laporan Shift Service - Mengirim laporan aktivitas user ke WhatsApp secara berka
 Jadwal pengiriman: 08:00 (pagi), 16:00 (sore), 00:00 (malam)
 """
 import os
+import json
 import threading
-import time
 import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy import func, literal_column, text
+from app.database import get_shared_engine
 from app.models.log_tugas import LogTugas, User
 
 logger = logging.getLogger(__name__)
 
+# Maximum single sleep in monitoring_loop before the next report time is recomputed
+REPORT_MAX_WAIT_SECONDS = 600
+
+# Separator GROUP_CONCAT: antar field (catatan/keterangan) dan antar log dalam satu kegiatan
+LOG_FIELD_SEPARATOR = '\x1e'
+LOG_ENTRY_SEPARATOR = '\x1f'
+GROUP_CONCAT_MAX_LEN = 1024 * 1024
+
+# Template pesan laporan shift (dibangun sekali saat import)
+REPORT_SEPARATOR = '=' * 40
+REPORT_HEADER_TEMPLATE = "📊 *LAPORAN {shift}*\n" + REPORT_SEPARATOR + "\n\n📅 *Periode:* {start} - {end}"
+REPORT_EMPTY_LINE = "ℹ️ Tidak ada aktivitas yang tercatat pada shift ini."
+REPORT_ACTIVITIES_HEADER = REPORT_SEPARATOR + "\n"
+REPORT_GROUP_TEMPLATE = "*{idx}. {nama_tugas}*"
+REPORT_CATATAN_TEMPLATE = "   📌 {catatan}"
+REPORT_KETERANGAN_TEMPLATE = "   🔧 Keterangan: {catatan_petugas}"
+REPORT_FOOTER_TEMPLATE = REPORT_SEPARATOR + "\nLaporan digenerate otomatis oleh sistematis\n📅 {generated_at}\n"
+
 class LaporanShiftService:
     """
     Service untuk mengirim laporan shift ke WhatsApp secara otomatis
@@ -23,25 +42,29 @@ class LaporanShiftService:
         self.config = config
         self.watzap_service = watzap_service
         self.app = app
-        self.running = False
         self.thread = None
+        self._stop_event = threading.Event()
         
         # Jadwal pengiriman laporan (jam)
         self.report_hours = [8, 16, 0]  # 08:00, 16:00, 00:00
         
-        # Setup database connection dengan thread-safe session
-        self.engine = create_engine(
-            config.SQLALCHEMY_DATABASE_URI,
-            pool_pre_ping=True,
-            pool_recycle=300,
-            echo=False
-        )
-        self.Session = sessionmaker(bind=self.engine)
+        # Setup database connection dengan thread-safe session (engine dipakai bersama)
+        self.engine = get_shared_engine(config)
+        self.Session = scoped_session(sessionmaker(bind=self.engine, expire_on_commit=False, autoflush=False))
         
         # Track last report time untuk mencegah duplikasi
-        self.last_report_date = {}
-        for hour in self.report_hours:
-            self.last_report_date[hour] = None
+        # Tidak pernah dimutasi in-place: writer mengganti seluruh dict (lihat mark_report_sent)
+        self.last_report_date = {hour: None for hour in self.report_hours}
+        
+        # Persist last_report_date agar restart tidak mengirim ulang / melewatkan laporan
+        self.state_dir = getattr(config, 'CSV_OUTPUT_DIR', 'ping_results')
+        os.makedirs(self.state_dir, exist_ok=True)
+        self.state_path = os.path.join(self.state_dir, 'laporan_shift_state.json')
+        self._load_state()
+        
+        # Cache formatted report per (hour, date) so a retry after a failed send
+        # does not re-query and re-format the same shift
+        self._report_cache: Dict[tuple, str] = {}
         
         # Configuration
         self.enabled = getattr(config, 'ENABLE_SHIFT_REPORT', True)
@@ -51,6 +74,48 @@ class LaporanShiftService:
         logger.info(f"Report schedule: {self.report_hours}")
         logger.info(f"Status: {'Enabled' if self.enabled else 'Disabled'}")
     
+    def _load_state(self):
+        """Load persisted last_report_date from state file"""
+        try:
+            if not os.path.exists(self.state_path):
+                return
+            
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            
+            snapshot = dict(self.last_report_date)
+            for hour, date in state.get('last_report_date', {}).items():
+                if int(hour) in snapshot:
+                    snapshot[int(hour)] = date
+            self.last_report_date = snapshot
+            
+            logger.info(f"📂 Loaded shift report state: {snapshot}")
+        except Exception as e:
+            logger.error(f"Error loading shift report state: {e}")
+    
+    def _save_state(self, last_report_date: Dict):
+        """Write last_report_date to state file (atomic temp file + rename)"""
+        temp_path = self.state_path + '.tmp'
+        try:
+            state = {
+                'last_report_date': {str(hour): date for hour, date in last_report_date.items()},
+                'updated_at': datetime.now().isoformat()
+            }
+            
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            
+            os.replace(temp_path, self.state_path)
+        except Exception as e:
+            logger.error(f"Error saving shift report state: {e}")
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except OSError:
+                pass
+    
     def get_shift_name(self, hour: int) -> str:
         """Get shift name based on hour"""
         if hour == 8:
@@ -91,86 +156,97 @@ class LaporanShiftService:
     def get_log_tugas_data(self, start_time: datetime, end_time: datetime) -> List[Dict]:
         """
         Get log tugas data from database for the specified time range
+        Sudah di-group per nama_tugas oleh database (satu row per kegiatan)
         """
-        session = self.Session()
         try:
-            # Query dengan JOIN ke users table
-            results = session.query(
-                LogTugas.nama_tugas,
-                LogTugas.catatan,
-                LogTugas.catatan_petugas,
-                User.name,
-                LogTugas.created_at
-            ).join(
-                User, LogTugas.user_id == User.id
-            ).filter(
-                LogTugas.created_at >= start_time,
-                LogTugas.created_at < end_time
-            ).order_by(
-                LogTugas.created_at.desc()
-            ).all()
+            # GROUP_CONCAT dengan ORDER BY/SEPARATOR tidak bisa dibangun lewat func.group_concat
+            table = LogTugas.__tablename__
+            entries_column = literal_column(
+                f"GROUP_CONCAT(CONCAT_WS('{LOG_FIELD_SEPARATOR}', "
+                f"COALESCE({table}.catatan, ''), COALESCE({table}.catatan_petugas, '')) "
+                f"ORDER BY {table}.created_at DESC SEPARATOR '{LOG_ENTRY_SEPARATOR}')"
+            ).label('entries')
+            
+            with self.Session() as session:
+                # Default group_concat_max_len (1024 byte) terlalu kecil untuk shift yang ramai
+                session.execute(
+                    text("SET SESSION group_concat_max_len = :max_len"),
+                    {'max_len': GROUP_CONCAT_MAX_LEN}
+                )
+                
+                # Query dengan JOIN ke users table, urut berdasarkan aktivitas terbaru per kegiatan
+                results = session.query(
+                    LogTugas.nama_tugas,
+                    func.count(LogTugas.id).label('entry_count'),
+                    entries_column
+                ).join(
+                    User, LogTugas.user_id == User.id
+                ).filter(
+                    LogTugas.created_at >= start_time,
+                    LogTugas.created_at < end_time
+                ).group_by(
+                    LogTugas.nama_tugas
+                ).order_by(
+                    func.max(LogTugas.created_at).desc()
+                ).all()
             
             # Convert to list of dictionaries
             log_data = []
+            total_entries = 0
             for row in results:
+                entries = []
+                for entry in (row.entries or '').split(LOG_ENTRY_SEPARATOR):
+                    catatan, _, catatan_petugas = entry.partition(LOG_FIELD_SEPARATOR)
+                    entries.append((catatan, catatan_petugas))
+                
                 log_data.append({
                     'nama_tugas': row.nama_tugas,
-                    'catatan': row.catatan,
-                    'catatan_petugas': row.catatan_petugas,
-                    'user_name': row.name,
-                    'created_at': row.created_at
+                    'entries': entries
                 })
+                total_entries += row.entry_count
             
-            logger.info(f"Found {len(log_data)} log tugas entries for period {start_time} to {end_time}")
+            logger.info(f"Found {total_entries} log tugas entries in {len(log_data)} activities for period {start_time} to {end_time}")
             return log_data
             
         except Exception as e:
             logger.error(f"Error getting log tugas data: {e}")
             return []
-        finally:
-            session.close()
     
     def format_laporan_message(self, shift_name: str, start_time: datetime, end_time: datetime, log_data: List[Dict]) -> str:
         """
         Format laporan message for WhatsApp
-        Group activities by nama_tugas (nama_kegiatan) instead of by user
+        log_data sudah di-group per nama_tugas (nama_kegiatan) oleh get_log_tugas_data
         """
-        message = f"📊 *LAPORAN {shift_name.upper()}*\n"
-        message += f"{'='*40}\n\n"
-        message += f"📅 *Periode:* {start_time.strftime('%d/%m/%Y %H:%M')} - {end_time.strftime('%d/%m/%Y %H:%M')}\n"
+        parts = [REPORT_HEADER_TEMPLATE.format(
+            shift=shift_name.upper(),
+            start=start_time.strftime('%d/%m/%Y %H:%M'),
+            end=end_time.strftime('%d/%m/%Y %H:%M')
+        )]
         
         if not log_data:
-            message += "ℹ️ Tidak ada aktivitas yang tercatat pada shift ini.\n"
+            parts.append(REPORT_EMPTY_LINE)
         else:
-            message += f"{'='*40}\n\n"
-            
-            # Group by nama_tugas (nama_kegiatan)
-            activity_groups = {}
-            for log in log_data:
-                nama_tugas = log.get('nama_tugas', 'Aktivitas Lainnya')
-                if nama_tugas not in activity_groups:
-                    activity_groups[nama_tugas] = []
-                activity_groups[nama_tugas].append(log)
+            parts.append(REPORT_ACTIVITIES_HEADER)
             
             # Format per activity group
-            for idx, (nama_tugas, logs) in enumerate(activity_groups.items(), 1):
-                message += f"*{idx}. {nama_tugas}*\n"
+            for idx, group in enumerate(log_data, 1):
+                parts.append(REPORT_GROUP_TEMPLATE.format(idx=idx, nama_tugas=group['nama_tugas']))
                 
                 # Show all catatan and catatan_petugas for this activity
-                for log in logs:
-                    if log.get('catatan'):
-                        message += f"   📌 {log.get('catatan')}\n"
+                for catatan, catatan_petugas in group['entries']:
+                    if catatan:
+                        parts.append(REPORT_CATATAN_TEMPLATE.format(catatan=catatan))
                     
-                    if log.get('catatan_petugas'):
-                        message += f"   🔧 Keterangan: {log.get('catatan_petugas')}\n"
+                    if catatan_petugas:
+                        parts.append(REPORT_KETERANGAN_TEMPLATE.format(catatan_petugas=catatan_petugas))
                 
-                message += f"\n"
+                parts.append("")
         
-        message += f"{'='*40}\n"
-        message += f"Laporan digenerate otomatis oleh sistematis\n"
-        message += f"📅 {datetime.now().strftime('%d %B %Y, %H:%M:%S')}\n"
+        parts.append(REPORT_FOOTER_TEMPLATE.format(
+            generated_at=datetime.now().strftime('%d %B %Y, %H:%M:%S')
+        ))
         
-        return message
+        return "\n".join(parts)
     
     def send_shift_report(self, hour: int) -> bool:
         """
@@ -183,27 +259,37 @@ class LaporanShiftService:
             
             # Get shift info
             shift_name = self.get_shift_name(hour)
-            start_time, end_time = self.get_shift_time_range(hour)
-            
-            logger.info(f"Generating {shift_name} report...")
-            logger.info(f"Period: {start_time} to {end_time}")
-            
-            # Get log tugas data
-            log_data = self.get_log_tugas_data(start_time, end_time)
+            cache_key = (hour, datetime.now().strftime('%Y-%m-%d'))
+            message = self._report_cache.get(cache_key)
             
-            # Format message
-            message = self.format_laporan_message(shift_name, start_time, end_time, log_data)
+            if message is None:
+                start_time, end_time = self.get_shift_time_range(hour)
+                
+                logger.info(f"Generating {shift_name} report...")
+                logger.info(f"Period: {start_time} to {end_time}")
+                
+                # Get log tugas data
+                log_data = self.get_log_tugas_data(start_time, end_time)
+                
+                # Format message
+                message = self.format_laporan_message(shift_name, start_time, end_time, log_data)
+                self._report_cache[cache_key] = message
+            else:
+                logger.info(f"Reusing cached {shift_name} report for retry")
             
             # Send via Watzap
             if self.target_group:
                 logger.info(f"Sending report to group: {self.target_group}")
-                result = self.watzap_service.send_to_group(self.target_group, message)
+                result = self.watzap_service.send_message(self.target_group, message)
+                sent = bool(result) and result.get('status') == 'success'
             else:
                 logger.info("No target group specified, sending as broadcast")
                 result = self.watzap_service.broadcast_message(message)
+                sent = bool(result) and result.get('success_count', 0) > 0
             
-            if result and result.get('success'):
+            if sent:
                 logger.info(f"✅ {shift_name} report sent successfully!")
+                self._report_cache.pop(cache_key, None)
                 return True
             else:
                 logger.error(f"❌ Failed to send {shift_name} report: {result}")
@@ -225,7 +311,8 @@ class LaporanShiftService:
         
         # Check if report already sent today for this hour
         today_date = datetime.now().strftime('%Y-%m-%d')
-        last_sent = self.last_report_date.get(current_hour)
+        last_report_date = self.last_report_date  # snapshot
+        last_sent = last_report_date.get(current_hour)
         
         if last_sent == today_date:
             return False  # Already sent today
@@ -235,40 +322,80 @@ class LaporanShiftService:
     def mark_report_sent(self, hour: int):
         """Mark report as sent for today"""
         today_date = datetime.now().strftime('%Y-%m-%d')
-        self.last_report_date[hour] = today_date
+        
+        # Copy-on-write: reader selalu melihat snapshot yang konsisten tanpa lock
+        snapshot = dict(self.last_report_date)
+        snapshot[hour] = today_date
+        self.last_report_date = snapshot
+        self._save_state(snapshot)
         logger.info(f"Report for hour {hour} marked as sent for {today_date}")
+        
+        # Drop cached reports older than 2 days (never successfully sent)
+        cutoff_date = (datetime.now() - timedelta(days=2)).strftime('%Y-%m-%d')
+        for key in [k for k in self._report_cache if k[1] < cutoff_date]:
+            del self._report_cache[key]
+    
+    @property
+    def running(self) -> bool:
+        """True while the monitoring thread is alive and not asked to stop"""
+        return self.thread is not None and self.thread.is_alive() and not self._stop_event.is_set()
+    
+    def _get_next_report_datetime(self, now: datetime) -> datetime:
+        """
+        Get the next report datetime that has not been sent yet
+        A report stays due for the whole scheduled hour, so a late wake-up or
+        clock jump past minute 0 still sends it
+        """
+        today_date = now.strftime('%Y-%m-%d')
+        last_report_date = self.last_report_date  # snapshot
+        candidates = []
+        
+        for hour in self.report_hours:
+            scheduled = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+            
+            # Today's slot is still due if not sent and we are within its hour
+            if now < scheduled + timedelta(hours=1) and last_report_date.get(hour) != today_date:
+                candidates.append(scheduled)
+            else:
+                candidates.append(scheduled + timedelta(days=1))
+        
+        return min(candidates)
     
     def monitoring_loop(self):
         """
-        Main monitoring loop - check setiap menit
+        Main monitoring loop - tidur sampai jadwal laporan berikutnya
         """
         logger.info("📊 Laporan Shift monitoring started")
         
-        while self.running:
+        while not self._stop_event.is_set():
             try:
-                now = datetime.now()
-                current_hour = now.hour
-                current_minute = now.minute
+                next_fire = self._get_next_report_datetime(datetime.now())
+                wait_seconds = (next_fire - datetime.now()).total_seconds()
                 
-                # Check hanya di menit ke-0 (awal jam)
-                if current_minute == 0:
-                    if self.should_send_report(current_hour):
-                        logger.info(f"⏰ Report time! Hour: {current_hour}")
-                        
-                        # Send report
-                        success = self.send_shift_report(current_hour)
-                        
-                        if success:
-                            self.mark_report_sent(current_hour)
-                        else:
-                            logger.warning(f"Report sending failed for hour {current_hour}")
+                # Re-evaluate at least every REPORT_MAX_WAIT_SECONDS to follow wall-clock adjustments
+                if wait_seconds > 0:
+                    if self._stop_event.wait(timeout=min(wait_seconds, REPORT_MAX_WAIT_SECONDS)):
+                        break
+                    if datetime.now() < next_fire:
+                        continue
                 
-                # Sleep 60 detik sebelum check lagi
-                time.sleep(60)
+                report_hour = next_fire.hour
+                if self.should_send_report(report_hour):
+                    logger.info(f"⏰ Report time! Hour: {report_hour}")
+                    
+                    # Send report
+                    success = self.send_shift_report(report_hour)
+                    
+                    if success:
+                        self.mark_report_sent(report_hour)
+                    else:
+                        logger.warning(f"Report sending failed for hour {report_hour}")
+                        # Retry later instead of spinning on the same due slot
+                        self._stop_event.wait(timeout=60)
                 
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(60)  # Continue after error
+                self._stop_event.wait(timeout=60)  # Continue after error
     
     def start(self):
         """Start the shift report service"""
@@ -280,7 +407,7 @@ class LaporanShiftService:
             logger.warning("Laporan Shift service already running")
             return
         
-        self.running = True
+        self._stop_event.clear()
         self.thread = threading.Thread(target=self.monitoring_loop, daemon=True)
         self.thread.start()
         logger.info("✅ Laporan Shift service started")
@@ -291,11 +418,12 @@ class LaporanShiftService:
             return
         
         logger.info("Stopping Laporan Shift service...")
-        self.running = False
+        self._stop_event.set()
         
         if self.thread:
             self.thread.join(timeout=5)
         
+        self.Session.remove()
         logger.info("✅ Laporan Shift service stopped")
     
     def get_status(self) -> Dict:
@@ -305,7 +433,8 @@ class LaporanShiftService:
             'enabled': self.enabled,
             'report_hours': self.report_hours,
             'target_group': self.target_group,
-            'last_report_dates': self.last_report_date,
+            'last_report_dates': dict(self.last_report_date),
+            'state_file': self.state_path,
             'next_reports': self._get_next_report_times()
         }
     
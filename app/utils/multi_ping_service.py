@@ -1,9 +1,11 @@
+import atexit
 import threading
 import time
+import random
 import logging
 import pymysql
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from config import Config
 from app.models.inventaris import Inventaris
 from app.utils.database_monitor import DatabaseMonitor
@@ -25,8 +27,9 @@ class MultiPingService:
     def __init__(self, config: Config, app=None):
         self.config = config
         self.app = app  # Store Flask app for database context
-        self.running = False
         self.thread = None
+        self._stop = threading.Event()
+        self._atexit_registered = False
         
         # Initialize modular components
         self.database_monitor = DatabaseMonitor(config)
@@ -44,12 +47,29 @@ class MultiPingService:
         self._min_ping_interval = 2  # Minimum 2 seconds between ping cycles
         self._ping_in_progress = False
         
+        # Sampled cycles: reuse last results for steady-UP devices, full sweep every N cycles
+        self.sampling_enabled = getattr(config, 'ENABLE_PING_SAMPLING', False)
+        self.sample_ratio = getattr(config, 'PING_SAMPLE_RATIO', 0.1)
+        self.full_sweep_every = max(1, getattr(config, 'PING_FULL_SWEEP_EVERY', 10))
+        self._cycle_count = 0
+        self._last_all_ok = False
+        self._last_results: Dict[str, Dict] = {}
+        
+        # CSV di-append tiap cycle; prune/compact hanya saat device berubah atau tiap N cycle
+        self.csv_prune_every = max(1, getattr(config, 'CSV_PRUNE_EVERY_CYCLES', 60))
+        self._csv_prune_pending = True  # compact sekali setelah start
+        
         logger.info("Multi-ping service initialized with modular components")
         logger.info(f"Database monitoring: Every {self.database_monitor.device_check_interval}s")
         logger.info(f"Ping execution: {self.ping_executor.max_workers} workers, {self.ping_executor.ping_timeout}s timeout")
         logger.info(f"CSV output: {self.csv_manager.csv_dir}")
         logger.info(f"Ping cycle control: Minimum {self._min_ping_interval}s interval between cycles")
     
+    @property
+    def running(self) -> bool:
+        """True while the monitoring thread is alive and not asked to stop"""
+        return self.thread is not None and self.thread.is_alive() and not self._stop.is_set()
+    
     def ping_single_device(self, device: Inventaris) -> Dict:
         """
         Ping a single device (delegate to ping executor)
@@ -88,29 +108,32 @@ class MultiPingService:
             logger.info(f"Starting ping cycle for {len(devices)} devices")
             cycle_start = time.time()
             
-            # Execute concurrent pings
-            results = self.ping_executor.ping_devices_concurrent(devices)
-            active_ips = [d.ip for d in devices if d.ip]
+            # Execute concurrent pings (statistics dihitung sekaligus saat mengumpulkan hasil)
+            # results = hasil yang diukur di cycle ini saja (cycle sampled: subset device)
+            results, stats = self._ping_devices(devices)
             
             if results:
-                # Calculate and log statistics
-                stats = self.ping_executor.get_ping_statistics(results)
                 logger.info(f"Ping cycle completed - Success: {stats['successful_pings']}/{stats['total_devices']} "
                            f"({stats['success_rate']}%), "
                            f"Avg response: {stats['average_response_time_ms']}ms")
                 
-                # Write results to CSV with pruning using current active IPs
-                self.csv_manager.write_ping_results_to_csv(results, active_ips=active_ips)
+                # Append results to CSV; prune stale IPs only when needed
+                self.csv_manager.append_ping_results(results)
+                if self._csv_prune_pending or self._cycle_count % self.csv_prune_every == 0:
+                    # active_ips di-cache oleh database monitor saat reload device list
+                    active_ips = self.database_monitor.active_ips or [d.ip for d in devices if d.ip]
+                    self.csv_manager.prune_inactive_ips(active_ips)
+                    self._csv_prune_pending = False
                 
                 # Update timeout tracking if enabled
                 if self.timeout_tracker:
                     self.timeout_tracker.update_timeout_tracking(results)
                     
-                    # Log timeout summary
-                    timeout_summary = self.timeout_tracker.get_timeout_summary()
-                    if timeout_summary.get('total_timeout_devices', 0) > 0:
-                        logger.info(f"Timeout tracking: {timeout_summary['total_timeout_devices']} devices timing out, "
-                                  f"max consecutive: {timeout_summary['max_consecutive_timeouts']}")
+                    # Log timeout summary (summary lengkap hanya dihitung jika ada device timeout)
+                    if self.timeout_tracker.get_active_count() > 0:
+                        timeout_summary = self.timeout_tracker.get_timeout_summary()
+                        logger.info(f"Timeout tracking: {timeout_summary.get('total_timeout_devices', 0)} devices timing out, "
+                                  f"max consecutive: {timeout_summary.get('max_consecutive_timeouts', 0)}")
                 
                 cycle_duration = time.time() - cycle_start
                 logger.debug(f"Complete ping cycle duration: {cycle_duration:.2f}s")
@@ -122,6 +145,88 @@ class MultiPingService:
         finally:
             self._ping_in_progress = False
     
+    def _ping_devices(self, devices: List[Inventaris]) -> Tuple[List[Dict], Dict]:
+        """
+        Ping devices for this cycle, returns (fresh results, statistics)
+        Jika sampling aktif dan cycle sebelumnya semua OK, hanya sebagian device yang di-ping;
+        sisanya memakai hasil cycle terakhir. Satu kegagalan memaksa full sweep berikutnya.
+        Hasil yang dipakai ulang hanya masuk statistik dan cek "semua OK" - yang dikembalikan
+        (untuk CSV dan timeout tracking) hanya hasil yang benar-benar diukur di cycle ini.
+        """
+        self._cycle_count += 1
+        
+        sampled = (
+            self.sampling_enabled
+            and self._last_all_ok
+            and self._cycle_count % self.full_sweep_every != 0
+        )
+        
+        if not sampled:
+            results = fresh = self.ping_executor.ping_devices_concurrent(devices)
+        else:
+            # Device baru (belum punya hasil) selalu di-ping
+            known = [d for d in devices if d.ip in self._last_results]
+            to_ping = [d for d in devices if d.ip not in self._last_results]
+            if known:
+                sample_size = max(1, int(len(known) * self.sample_ratio))
+                to_ping.extend(random.sample(known, sample_size))
+            
+            logger.info(f"Sampled ping cycle: {len(to_ping)}/{len(devices)} devices")
+            fresh = self.ping_executor.ping_devices_concurrent(to_ping)
+            
+            fresh_ips = {r['ip_address'] for r in fresh}
+            results = fresh + [
+                self._last_results[d.ip] for d in devices
+                if d.ip not in fresh_ips and d.ip in self._last_results
+            ]
+        
+        if not results:
+            self._last_all_ok = False
+            return fresh, {}
+        
+        # Satu pass: index hasil per IP sekaligus akumulasi statistik (termasuk hasil yang dipakai ulang)
+        last_results = {}
+        successful = 0
+        response_sum_us = 0
+        response_count = 0
+        response_min_us = None
+        response_max_us = None
+        processing_sum = 0.0
+        processing_count = 0
+        processing_max = None
+        
+        for r in results:
+            last_results[r['ip_address']] = r
+            
+            processing_time = r.get('processing_time_ms')
+            if processing_time is not None:
+                processing_sum += processing_time
+                processing_count += 1
+                if processing_max is None or processing_time > processing_max:
+                    processing_max = processing_time
+            
+            if r['ping_success']:
+                successful += 1
+                response_us = r['response_time_us']
+                if response_us is not None:
+                    response_sum_us += response_us
+                    response_count += 1
+                    if response_min_us is None or response_us < response_min_us:
+                        response_min_us = response_us
+                    if response_max_us is None or response_us > response_max_us:
+                        response_max_us = response_us
+        
+        self._last_results = last_results
+        self._last_all_ok = successful == len(results)
+        
+        stats = self.ping_executor.build_ping_statistics(
+            len(results), successful,
+            response_sum_us, response_count, response_min_us, response_max_us,
+            processing_sum, processing_count, processing_max
+        )
+        
+        return fresh, stats
+    
     def _monitoring_loop(self):
         """
         Main monitoring loop that runs in background thread
@@ -133,7 +238,7 @@ class MultiPingService:
         # Initialize device cache pada startup
         self.database_monitor.initialize_cache()
         
-        while self.running:
+        while not self._stop.is_set():
             try:
                 start_time = time.time()
                 
@@ -141,6 +246,8 @@ class MultiPingService:
                 if self.database_monitor.check_database_changes():
                     logger.info("Database changes detected, reloading device list...")
                     device_count = self.database_monitor.reload_device_list()
+                    self.ping_executor.clear_device_templates()
+                    self._csv_prune_pending = True
                     logger.info(f"Successfully reloaded {device_count} devices from database")
                 
                 # Perform ping cycle (with built-in duplicate prevention)
@@ -153,14 +260,16 @@ class MultiPingService:
                 sleep_time = max(0, self.config.PING_INTERVAL - cycle_duration)
                 
                 if sleep_time > 0:
-                    time.sleep(sleep_time)
+                    if self._stop.wait(sleep_time):
+                        break
                 else:
                     logger.warning(f"Ping cycle took {cycle_duration:.2f}s, longer than interval {self.config.PING_INTERVAL}s")
                     logger.warning("Consider increasing PING_INTERVAL or reducing MAX_PING_WORKERS")
                     
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(self.config.PING_INTERVAL)
+                if self._stop.wait(self.config.PING_INTERVAL):
+                    break
     
     def start(self):
         """
@@ -170,9 +279,14 @@ class MultiPingService:
             logger.warning("Multi-ping monitoring service is already running")
             return
         
-        self.running = True
+        self._stop.clear()
         self.thread = threading.Thread(target=self._monitoring_loop, daemon=True)
         self.thread.start()
+        
+        # Cleanup eksplisit saat interpreter exit (bukan lewat __del__ saat GC)
+        if not self._atexit_registered:
+            atexit.register(self.cleanup_resources)
+            self._atexit_registered = True
         logger.info("Multi-ping monitoring service started")
     
     def stop(self):
@@ -183,9 +297,12 @@ class MultiPingService:
             logger.warning("Multi-ping monitoring service is not running")
             return
         
-        self.running = False
+        # Wakes the loop immediately; only an in-flight ping cycle can delay shutdown
+        self._stop.set()
         if self.thread:
             self.thread.join(timeout=10)
+            if self.thread.is_alive():
+                logger.warning("Monitoring thread still finishing current ping cycle")
         
         logger.info("Multi-ping monitoring service stopped")
     
@@ -199,9 +316,19 @@ class MultiPingService:
     
     def get_latest_ping_results_from_csv(self, limit: int = None) -> List[Dict]:
         """
-        Get latest ping results from CSV (delegate to CSV manager)
+        Get latest ping result per IP (format baris CSV)
+        Dilayani dari hasil cycle terakhir di memory: file CSV hari ini di-append tiap cycle
+        dan bisa berisi sampai CSV_PRUNE_EVERY_CYCLES baris per IP sebelum di-compact.
+        File CSV hanya dibaca sebelum cycle pertama selesai (misal tepat setelah restart).
         """
-        return self.csv_manager.get_latest_ping_results_from_csv(limit)
+        last_results = self._last_results  # dict di-swap utuh tiap cycle, aman dibaca tanpa lock
+        if not last_results:
+            return self.csv_manager.get_latest_ping_results_from_csv(limit)
+        
+        results = list(last_results.values())
+        if limit:
+            results = results[:limit]
+        return [self.csv_manager.to_csv_row(r) for r in results]
     
     def get_available_csv_files(self) -> List[Dict]:
         """
@@ -260,7 +387,10 @@ class MultiPingService:
                     'minimum_interval_seconds': self._min_ping_interval,
                     'ping_in_progress': self._ping_in_progress,
                     'last_ping_time': self._last_ping_time,
-                    'duplicate_prevention': True
+                    'duplicate_prevention': True,
+                    'sampling_enabled': self.sampling_enabled,
+                    'full_sweep_every': self.full_sweep_every,
+                    'last_cycle_all_ok': self._last_all_ok
                 },
                 'components': {
                     'database_monitor': self.database_monitor.get_monitoring_status(),
@@ -303,16 +433,18 @@ class MultiPingService:
             # Cleanup CSV files if needed
             self.csv_manager.cleanup_old_csv_files()
             
+            # Release ping executor resources (socket)
+            self.ping_executor.close()
+            
+            # Flush buffered timeout analytics rows and export timeout state to CSV
+            if self.timeout_tracker:
+                self.timeout_tracker.analytics.close()
+                self.timeout_tracker.close()
+            
             logger.info("Multi-ping service resources cleaned up")
             
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
-    
-    def __del__(self):
-        """
-        Destructor - cleanup resources
-        """
-        self.cleanup_resources()
 
 # Global instance
 multi_ping_service = None
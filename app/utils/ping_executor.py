@@ -1,15 +1,53 @@
+import re
 import time
+import asyncio
 import ping3  # type: ignore
 import logging
-import subprocess
+import shutil
+import socket
 import platform
+import ipaddress
+import threading
+import subprocess
 from datetime import datetime
-from typing import List, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from app.models.inventaris import Inventaris
+from app.utils.icmp_batch import ICMPBatchPinger
+
+try:
+    import icmplib  # ICMP dari satu proses tanpa fork ping per device
+    HAS_ICMPLIB = True
+except ImportError:
+    HAS_ICMPLIB = False
 
 logger = logging.getLogger(__name__)
 
+# RTT dari output system ping: "time=X.XX ms" (dicari langsung di bytes, tanpa decode)
+_TIME_RE = re.compile(rb'time=([\d.]+)')
+
+# Ringkasan fping -q per host (stderr): "10.0.0.1 : xmt/rcv/%loss = 1/1/0%, min/avg/max = 0.41/0.41/0.41"
+_FPING_SUMMARY_RE = re.compile(
+    rb'^(\S+)\s+:\s+xmt/rcv/%loss = \d+/(\d+)/\d+%(?:, min/avg/max = [\d.]+/([\d.]+)/[\d.]+)?',
+    re.MULTILINE
+)
+
+# Method tag dan pesan error yang berulang di setiap result dict: satu objek string dipakai bersama
+_METHOD_PING3 = 'ping3'
+_METHOD_ICMPLIB = 'icmplib'
+_METHOD_ICMP_BATCH = 'icmp_batch'
+_METHOD_SYSTEM_PING = 'system_ping'
+_METHOD_SYSTEM_PING_ASYNC = 'system_ping_async'
+_METHOD_FPING = 'fping'
+
+_ERR_TIMEOUT = 'No response (timeout)'
+_ERR_UNREACHABLE = 'Destination host unreachable'
+_ERR_TIMEOUT_PING3 = 'No response - timeout (ping3)'
+_ERR_UNREACHABLE_PING3 = 'Destination host unreachable (ping3)'
+_ERR_TIMEOUT_ICMPLIB = 'No response - timeout (icmplib)'
+_ERR_TIMEOUT_ICMP_BATCH = 'No response - timeout (icmp_batch)'
+_ERR_SYSTEM_PING_TIMEOUT = 'System ping timeout'
+
 class PingExecutor:
     """
     Class untuk menangani operasi ping dan statistik
@@ -22,220 +60,605 @@ class PingExecutor:
         self.max_workers = getattr(config, 'MAX_PING_WORKERS', 20)  # Max concurrent pings
         self.ping_timeout = getattr(config, 'PING_TIMEOUT', 3)  # Ping timeout in seconds
         
-        # Platform detection for fallback mechanism
+        # Platform detection (batch ICMP socket hanya Linux)
         self.is_linux = platform.system().lower() == 'linux'
+        # Verifikasi ulang ping3 yang gagal lewat icmplib (ICMP socket, tanpa fork /usr/bin/ping)
+        # Unprivileged butuh: sysctl -w net.ipv4.ping_group_range='0 2147483647'
         self.use_fallback = getattr(config, 'USE_SYSTEM_PING_FALLBACK', True)
+        if self.use_fallback and not HAS_ICMPLIB:
+            logger.warning("USE_SYSTEM_PING_FALLBACK enabled but icmplib is not installed - "
+                           "ping3 failures will NOT be re-checked (false positives possible)")
+            self.use_fallback = False
+        
+        # Async ping (asyncio event loop instead of thread pool)
+        # Concurrency berlaku untuk icmplib dan asyncio subprocess ping
+        self.use_async_ping = getattr(config, 'USE_ASYNC_PING', False)
+        self.async_ping_concurrency = getattr(config, 'ASYNC_PING_CONCURRENCY', 200)
+        
+        # icmplib multiping (raw/datagram ICMP sockets, no subprocess per device)
+        # Default backend bila icmplib terinstall; ping3 + thread pool tetap sebagai fallback
+        self.use_icmplib = getattr(config, 'USE_ICMPLIB', True)
+        self.icmplib_privileged = getattr(config, 'ICMPLIB_PRIVILEGED', False)
+        if self.use_icmplib and not HAS_ICMPLIB:
+            logger.warning("USE_ICMPLIB enabled but icmplib is not installed - using ping3 thread pool")
+            self.use_icmplib = False
+        
+        # DNS cache untuk device yang ip-nya berisi hostname: {host: (address, expires_at)}
+        self.dns_cache_ttl = getattr(config, 'DNS_CACHE_TTL', 900)
+        self._dns_cache: Dict[str, Tuple[str, float]] = {}
+        self._dns_lock = threading.Lock()
+        
+        # Satu socket ICMP yang dipakai ulang antar cycle (Linux); dibuka saat batch pertama
+        self.use_batch_socket = getattr(config, 'USE_BATCH_ICMP_SOCKET', False) and self.is_linux
+        self._batch_pinger = ICMPBatchPinger(privileged=getattr(config, 'BATCH_ICMP_PRIVILEGED', False))
+        
+        # fping: satu proses untuk re-check semua device yang gagal saat ping3 gagal massal
+        self.fping_path = shutil.which('fping') if getattr(config, 'USE_FPING_FALLBACK', True) else None
+        self.fping_mass_failure_ratio = getattr(config, 'FPING_MASS_FAILURE_RATIO', 0.5)
+        
+        # Template hasil per device (field statis), dibangun sekali per device: {device_id: dict}
+        self._device_templates: Dict[int, Dict] = {}
         
-        if self.is_linux:
-            logger.info("Running on Linux - system ping fallback enabled for reliability")
+        # Thread pool dipakai ulang antar cycle (worker tetap hidup, tidak dibuat ulang tiap ping)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ping')
+        
+        # Adaptive workers: jumlah ping in-flight menyesuaikan ukuran batch dan failure rate
+        self.min_workers = getattr(config, 'MIN_PING_WORKERS', 4)
+        self.high_failure_rate = getattr(config, 'PING_HIGH_FAILURE_RATE', 0.5)
+        self.current_workers = self.max_workers
+        self.failure_rate = 0.0  # rolling (EMA) failure rate jalur ping3
+        
+        if self.use_fallback:
+            logger.info("icmplib ping fallback enabled for ping3 failures")
+    
+    def _parse_system_ping_output(self, returncode: int, output: bytes, stderr: bytes,
+                                  elapsed: float, method: str = _METHOD_SYSTEM_PING) -> Dict:
+        """
+        Parse hasil system ping dari raw bytes stdout/stderr
+        """
+        if returncode == 0:
+            # Parse time from output: "time=X.XX ms"
+            match = _TIME_RE.search(output)
+            try:
+                response_ms = float(match.group(1)) if match else elapsed * 1000
+            except ValueError:
+                # Fallback jika parsing gagal tapi ping sukses
+                response_ms = elapsed * 1000
+            return {
+                'success': True,
+                'response_time_us': int(response_ms * 1000),
+                'error_message': None,
+                'method': method
+            }
+        else:
+            # Ping failed - stderr hanya di-decode di jalur gagal
+            error = stderr.decode(errors='replace') if stderr else 'No response'
+            return {
+                'success': False,
+                'response_time_us': None,
+                'error_message': f'System ping failed: {error.strip()[:100]}',
+                'method': method
+            }
     
-    def _ping_via_system(self, ip: str) -> Dict:
+    def _ping_via_fping(self, ips: List[str]) -> Dict[str, Tuple[bool, Optional[float]]]:
         """
-        Fallback: Use system ping command (reliable on Linux/CentOS)
+        Fallback bulk: ping banyak IP dengan satu proses fping
+        Returns {ip: (alive, avg_rtt_ms)}; IP yang tidak ada di output fping tidak dimasukkan
         """
+        cmd = [self.fping_path, '-c', '1', '-t', str(int(self.ping_timeout * 1000)), '-q'] + ips
         try:
-            # Linux ping command: -c 1 (count), -W timeout (wait)
-            cmd = ['ping', '-c', '1', '-W', str(int(self.ping_timeout)), ip]
-            
-            start = time.time()
             result = subprocess.run(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                timeout=self.ping_timeout + 1,
-                universal_newlines=True
+                timeout=self.ping_timeout + 5 + len(ips) * 0.01  # fping mengirim dengan interval 10ms
             )
-            elapsed = time.time() - start
-            
-            if result.returncode == 0:
-                # Parse time from output: "time=X.XX ms"
-                output = result.stdout
-                try:
-                    for line in output.split('\n'):
-                        if 'time=' in line:
-                            time_str = line.split('time=')[1].split()[0]
-                            response_ms = float(time_str)
-                            return {
-                                'success': True,
-                                'response_time_ms': round(response_ms, 2),
-                                'latency_ms': round(response_ms, 2),
-                                'error_message': None,
-                                'method': 'system_ping'
-                            }
-                except:
-                    pass
-                # Fallback jika parsing gagal tapi ping sukses
-                return {
-                    'success': True,
-                    'response_time_ms': round(elapsed * 1000, 2),
-                    'latency_ms': round(elapsed * 1000, 2),
-                    'error_message': None,
-                    'method': 'system_ping'
-                }
-            else:
-                # Ping failed
-                error = result.stderr or 'No response'
-                return {
-                    'success': False,
-                    'response_time_ms': None,
-                    'latency_ms': None,
-                    'error_message': f'System ping failed: {error.strip()[:100]}',
-                    'method': 'system_ping'
-                }
-        except subprocess.TimeoutExpired:
-            return {
-                'success': False,
-                'response_time_ms': None,
-                'latency_ms': None,
-                'error_message': 'System ping timeout',
-                'method': 'system_ping'
-            }
         except Exception as e:
+            logger.error(f"fping fallback error: {e}")
+            return {}
+        
+        # Exit code 1 = sebagian host unreachable (normal), summary tetap ditulis ke stderr
+        parsed = {}
+        for match in _FPING_SUMMARY_RE.finditer(result.stderr):
+            ip = match.group(1).decode()
+            received = int(match.group(2))
+            avg_rtt = float(match.group(3)) if match.group(3) else None
+            parsed[ip] = (received > 0, avg_rtt)
+        return parsed
+    
+    def _recheck_failures_with_fping(self, devices: List[Inventaris], results: List[Dict], cycle_ts: str):
+        """
+        Jika sebagian besar ping3 gagal (misal ICMP socket bermasalah), verifikasi ulang
+        semua device yang gagal dengan satu panggilan fping dan perbaiki false positive
+        """
+        failed = [r for r in results if not r['ping_success']]
+        if not failed or len(failed) < len(results) * self.fping_mass_failure_ratio:
+            return
+        
+        devices_by_id = {d.id: d for d in devices}
+        addresses = {r['device_id']: self._resolve(r['ip_address']) for r in failed}
+        
+        start_time = time.monotonic()
+        fping_results = self._ping_via_fping(sorted(set(addresses.values())))
+        elapsed = time.monotonic() - start_time
+        
+        recovered = 0
+        for index, r in enumerate(results):
+            if r['ping_success']:
+                continue
+            alive, avg_rtt = fping_results.get(addresses[r['device_id']], (False, None))
+            device = devices_by_id.get(r['device_id'])
+            if alive and device is not None:
+                rtt_us = int((avg_rtt if avg_rtt is not None else elapsed * 1000) * 1000)
+                results[index] = self._make_ping_result(device, True, rtt_us, None, _METHOD_FPING, elapsed, cycle_ts)
+                recovered += 1
+        
+        logger.info(f"fping re-check: {recovered}/{len(failed)} failed devices reachable ({elapsed:.2f}s)")
+    
+    def _icmplib_host_to_result(self, host) -> Dict:
+        """
+        Map icmplib Host object ke result dict
+        """
+        if host.is_alive:
             return {
-                'success': False,
-                'response_time_ms': None,
-                'latency_ms': None,
-                'error_message': f'System ping error: {str(e)}',
-                'method': 'system_ping'
+                'success': True,
+                'response_time_us': int(host.avg_rtt * 1000),
+                'error_message': None,
+                'method': _METHOD_ICMPLIB
             }
+        return {
+            'success': False,
+            'response_time_us': None,
+            'error_message': _ERR_TIMEOUT_ICMPLIB,
+            'method': _METHOD_ICMPLIB
+        }
+    
+    def _ping_via_icmplib(self, address: str) -> Optional[Dict]:
+        """
+        Fallback: verifikasi satu host lewat icmplib (None jika socket tidak tersedia)
+        """
+        try:
+            host = icmplib.ping(
+                address,
+                count=1,
+                timeout=self.ping_timeout,
+                privileged=self.icmplib_privileged
+            )
+            return self._icmplib_host_to_result(host)
+        except icmplib.SocketPermissionError as e:
+            logger.warning(f"⚠️ icmplib fallback dimatikan, ICMP socket tidak diizinkan: {e}")
+            logger.warning("   Unprivileged ICMP butuh: sysctl -w net.ipv4.ping_group_range='0 2147483647'")
+            self.use_fallback = False
+            return None
+        except Exception as e:
+            logger.debug(f"icmplib fallback error for {address}: {e}")
+            return None
     
-    def ping_single_device(self, device: Inventaris) -> Dict:
+    def _disable_icmplib(self, error: Exception):
+        """
+        Matikan icmplib untuk sisa proses (misal socket ICMP tidak diizinkan)
+        """
+        logger.warning(f"⚠️ icmplib tidak bisa membuka ICMP socket, kembali ke ping3: {error}")
+        logger.warning("   Unprivileged ICMP butuh: sysctl -w net.ipv4.ping_group_range='0 2147483647'")
+        self.use_icmplib = False
+    
+    def _resolve(self, host: str) -> str:
+        """
+        Resolve hostname ke IP dengan TTL cache; IP literal dikembalikan apa adanya
+        """
+        try:
+            ipaddress.ip_address(host)
+            return host
+        except ValueError:
+            pass
+        
+        now = time.monotonic()
+        cached = self._dns_cache.get(host)
+        if cached and cached[1] > now:
+            return cached[0]
+        
+        try:
+            address = socket.gethostbyname(host)
+        except (OSError, UnicodeError) as e:
+            # Biarkan ping melaporkan error seperti biasa; jangan cache kegagalan
+            logger.debug(f"DNS resolve failed for {host}: {e}")
+            return host
+        
+        with self._dns_lock:
+            self._dns_cache[host] = (address, now + self.dns_cache_ttl)
+        return address
+    
+    def ping_single_device(self, device: Inventaris, cycle_ts: Optional[str] = None) -> Dict:
         """
         Ping a single device and return comprehensive result
+        cycle_ts: timestamp cycle (dihitung sekali per cycle oleh pemanggil)
         """
-        start_time = time.time()
+        start_time = time.monotonic()
+        address = self._resolve(device.ip)
+        
+        if self.use_icmplib:
+            try:
+                host = icmplib.ping(
+                    address,
+                    count=1,
+                    timeout=self.ping_timeout,
+                    privileged=self.icmplib_privileged
+                )
+                if host.is_alive:
+                    return self._make_ping_result(device, True, int(host.avg_rtt * 1000), None, _METHOD_ICMPLIB,
+                                                  time.monotonic() - start_time, cycle_ts)
+                return self._make_ping_result(device, False, None, _ERR_TIMEOUT_ICMPLIB, _METHOD_ICMPLIB,
+                                              time.monotonic() - start_time, cycle_ts)
+            except icmplib.SocketPermissionError as e:
+                self._disable_icmplib(e)
+            except Exception as e:
+                # Misal nama host tidak bisa di-resolve: lanjut ke jalur ping3
+                logger.debug(f"icmplib ping error for {device.ip}: {e}")
+        
+        # Hasil disimpan sebagai variabel lokal; result dict dibangun sekali di akhir
+        success = False
+        response_us = None
+        error_message = None
+        method = _METHOD_PING3
         
         # Try ping3 first
-        ping3_result = None
         try:
             # Using ping3 library for cross-platform ping
-            response_time = ping3.ping(device.ip, timeout=self.ping_timeout)
+            response_time = ping3.ping(address, timeout=self.ping_timeout)
             
             # CRITICAL FIX: ping3 returns False for "Destination host unreachable"
-            # We MUST check if response_time is a number (float), not just "not None"
-            if response_time is not None and response_time is not False and isinstance(response_time, (int, float)):
-                ping3_result = {
-                    'success': True,
-                    'response_time_ms': round(response_time * 1000, 2),
-                    'latency_ms': round(response_time * 1000, 2),
-                    'error_message': None,
-                    'method': 'ping3'
-                }
+            # ping3 hanya mengembalikan float (detik), False, atau None - cukup cek float
+            if isinstance(response_time, float):
+                success = True
+                response_us = int(response_time * 1_000_000)
             elif response_time is False:
                 # False means "Destination host unreachable"
-                ping3_result = {
-                    'success': False,
-                    'response_time_ms': None,
-                    'latency_ms': None,
-                    'error_message': 'Destination host unreachable (ping3)',
-                    'method': 'ping3'
-                }
+                error_message = _ERR_UNREACHABLE_PING3
             else:
                 # None means timeout
-                ping3_result = {
-                    'success': False,
-                    'response_time_ms': None,
-                    'latency_ms': None,
-                    'error_message': 'No response - timeout (ping3)',
-                    'method': 'ping3'
-                }
+                error_message = _ERR_TIMEOUT_PING3
                 
         except Exception as e:
-            ping3_result = {
-                'success': False,
-                'response_time_ms': None,
-                'latency_ms': None,
-                'error_message': f"Ping3 error: {str(e)}",
-                'method': 'ping3'
-            }
+            error_message = f"Ping3 error: {str(e)}"
         
-        # FALLBACK: Jika ping3 gagal DI LINUX dan fallback diaktifkan, coba system ping
-        result = ping3_result
-        if self.is_linux and self.use_fallback and not ping3_result['success']:
-            # Coba verifikasi dengan system ping
-            system_result = self._ping_via_system(device.ip)
+        # FALLBACK: Jika ping3 gagal dan fallback diaktifkan, verifikasi dengan icmplib
+        if self.use_fallback and not success:
+            fallback_result = self._ping_via_icmplib(address)
             
-            # Jika system ping berhasil tapi ping3 gagal = false positive dari ping3
-            if system_result['success']:
-                logger.warning(f"⚠️ FALSE POSITIVE terdeteksi untuk {device.ip}: ping3 gagal tapi system ping sukses")
-                logger.warning(f"   ping3: {ping3_result['error_message']}")
-                logger.warning(f"   system: {system_result['response_time_ms']}ms")
-                result = system_result  # Gunakan hasil system ping
-            else:
-                # Kedua method gagal - benar-benar timeout
-                result = ping3_result
+            # Jika icmplib berhasil tapi ping3 gagal = false positive dari ping3
+            if fallback_result is not None and fallback_result['success']:
+                logger.warning(f"⚠️ FALSE POSITIVE terdeteksi untuk {device.ip}: ping3 gagal tapi icmplib sukses")
+                logger.warning(f"   ping3: {error_message}")
+                logger.warning(f"   icmplib: {fallback_result['response_time_us'] / 1000}ms")
+                # Gunakan hasil icmplib
+                success = True
+                response_us = fallback_result['response_time_us']
+                error_message = None
+                method = fallback_result['method']
         
         # Calculate total processing time
-        processing_time = time.time() - start_time
+        processing_time = time.monotonic() - start_time
         
-        # Create comprehensive result dictionary
-        ping_result = {
-            'timestamp': datetime.now().isoformat(),
-            'device_id': device.id,
-            'ip_address': device.ip,
-            'hostname': device.hostname or device.ip,
-            'ping_success': result['success'],
-            'response_time_ms': result['response_time_ms'],
-            'latency_ms': result['latency_ms'],
-            'error_message': result['error_message'],
-            'ping_method': result.get('method', 'ping3'),
-            'merk': device.merk,
-            'os': device.os,
-            'kondisi': device.kondisi,
-            'id_lokasi': device.id_lokasi,
+        return self._make_ping_result(device, success, response_us, error_message, method, processing_time, cycle_ts)
+    
+    def _device_template(self, device: Inventaris) -> Dict:
+        """
+        Template result dict per device; field statis dibaca dari ORM object sekali saja
+        Dibangun ulang jika IP berubah (misal mock device dengan id sama)
+        """
+        template = self._device_templates.get(device.id)
+        if template is None or template['ip_address'] != device.ip:
+            template = {
+                'timestamp': None,
+                'device_id': device.id,
+                'ip_address': device.ip,
+                'hostname': device.hostname or device.ip,
+                'ping_success': False,
+                'response_time_ms': None,
+                'latency_ms': None,
+                'response_time_us': None,
+                'error_message': None,
+                'ping_method': None,
+                'merk': device.merk,
+                'os': device.os,
+                'kondisi': device.kondisi,
+                'id_lokasi': device.id_lokasi,
+                'processing_time_ms': 0
+            }
+            self._device_templates[device.id] = template
+        return template
+    
+    def clear_device_templates(self):
+        """
+        Buang template device (dipanggil saat device list di-reload dari database)
+        """
+        self._device_templates = {}
+    
+    def _make_ping_result(self, device: Inventaris, success: bool, response_us: Optional[int],
+                          error_message: Optional[str], method: str, processing_time: float,
+                          timestamp: Optional[str] = None) -> Dict:
+        """
+        Create comprehensive result dictionary for a device (satu konstruksi dari template)
+        RTT disimpan sebagai integer mikrodetik; response_time_ms hanya turunan untuk tampilan/CSV
+        """
+        response_ms = response_us / 1000 if response_us is not None else None
+        return {
+            **self._device_template(device),
+            'timestamp': timestamp or datetime.now().isoformat(),
+            'ping_success': success,
+            'response_time_ms': response_ms,
+            'latency_ms': response_ms,
+            'response_time_us': response_us,
+            'error_message': error_message,
+            'ping_method': method,
             'processing_time_ms': round(processing_time * 1000, 2)
         }
+    
+    def _build_ping_result(self, device: Inventaris, result: Dict, processing_time: float,
+                           timestamp: Optional[str] = None) -> Dict:
+        """
+        Create result dictionary from a backend result dict (batch/icmplib/async path)
+        """
+        return self._make_ping_result(
+            device,
+            result['success'],
+            result['response_time_us'],
+            result['error_message'],
+            result.get('method', _METHOD_PING3),
+            processing_time,
+            timestamp
+        )
+    
+    def ping_devices_batch_socket(self, devices: List[Inventaris]) -> List[Dict]:
+        """
+        Ping multiple devices through one reused ICMP socket (USE_BATCH_ICMP_SOCKET)
+        """
+        start_time = time.monotonic()
+        cycle_ts = datetime.now().isoformat()
+        logger.info(f"Starting batch ICMP ping for {len(devices)} devices")
+        
+        try:
+            addresses = [self._resolve(d.ip) for d in devices]
+            rtts = self._batch_pinger.ping_batch(addresses, self.ping_timeout)
+        except PermissionError as e:
+            logger.warning(f"⚠️ Batch ICMP socket tidak diizinkan, kembali ke jalur lain: {e}")
+            self.use_batch_socket = False
+            return None
+        except Exception as e:
+            logger.error(f"Error in batch ICMP ping execution, falling back: {e}")
+            self._batch_pinger.close()  # buka ulang socket di cycle berikutnya
+            return None
+        
+        total_time = time.monotonic() - start_time
+        
+        results = []
+        for device, address in zip(devices, addresses):
+            rtt_ms = rtts.get(address)
+            if rtt_ms is not None:
+                result = {
+                    'success': True,
+                    'response_time_us': int(rtt_ms * 1000),
+                    'error_message': None,
+                    'method': _METHOD_ICMP_BATCH
+                }
+            else:
+                result = {
+                    'success': False,
+                    'response_time_us': None,
+                    'error_message': _ERR_TIMEOUT_ICMP_BATCH,
+                    'method': _METHOD_ICMP_BATCH
+                }
+            results.append(self._build_ping_result(device, result, total_time, cycle_ts))
         
-        return ping_result
+        logger.info(f"Completed batch ICMP ping in {total_time:.2f}s for {len(results)} devices")
+        return results
+    
+    async def _aping_all(self, devices: List[Inventaris]) -> List:
+        """
+        Ping semua device dari satu event loop (tanpa thread per device)
+        """
+        return await icmplib.async_multiping(
+            [self._resolve(d.ip) for d in devices],
+            count=1,
+            timeout=self.ping_timeout,
+            concurrent_tasks=self.async_ping_concurrency,
+            privileged=self.icmplib_privileged
+        )
+    
+    def ping_devices_icmplib(self, devices: List[Inventaris]) -> List[Dict]:
+        """
+        Ping multiple devices with icmplib.async_multiping (USE_ICMPLIB)
+        """
+        start_time = time.monotonic()
+        cycle_ts = datetime.now().isoformat()
+        logger.info(f"Starting icmplib ping for {len(devices)} devices (concurrency {self.async_ping_concurrency})")
+        
+        try:
+            hosts = asyncio.run(self._aping_all(devices))
+        except icmplib.SocketPermissionError as e:
+            # Unprivileged ICMP tidak diizinkan (net.ipv4.ping_group_range): jangan coba lagi tiap cycle
+            self._disable_icmplib(e)
+            return None
+        except Exception as e:
+            logger.error(f"Error in icmplib ping execution, falling back: {e}")
+            return None
+        
+        total_time = time.monotonic() - start_time
+        
+        # multiping mengembalikan host dengan urutan yang sama seperti input
+        results = [
+            self._build_ping_result(device, self._icmplib_host_to_result(host), total_time, cycle_ts)
+            for device, host in zip(devices, hosts)
+        ]
+        
+        logger.info(f"Completed icmplib ping in {total_time:.2f}s for {len(results)} devices")
+        return results
+    
+    async def _ping_single_device_async(self, device: Inventaris, semaphore: asyncio.Semaphore,
+                                        cycle_ts: str) -> Dict:
+        """
+        Ping a single device via asyncio subprocess (system ping)
+        """
+        async with semaphore:
+            start_time = time.monotonic()
+            proc = None
+            
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    'ping', '-c', '1', '-W', str(int(self.ping_timeout)), self._resolve(device.ip),
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.ping_timeout + 1)
+                elapsed = time.monotonic() - start_time
+                
+                result = self._parse_system_ping_output(
+                    proc.returncode,
+                    stdout,
+                    stderr,
+                    elapsed,
+                    method=_METHOD_SYSTEM_PING_ASYNC
+                )
+            except asyncio.TimeoutError:
+                if proc is not None and proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+                result = {
+                    'success': False,
+                    'response_time_us': None,
+                    'error_message': _ERR_SYSTEM_PING_TIMEOUT,
+                    'method': _METHOD_SYSTEM_PING_ASYNC
+                }
+            except Exception as e:
+                result = {
+                    'success': False,
+                    'response_time_us': None,
+                    'error_message': f'System ping error: {str(e)}',
+                    'method': _METHOD_SYSTEM_PING_ASYNC
+                }
+            
+            return self._build_ping_result(device, result, time.monotonic() - start_time, cycle_ts)
+    
+    async def _ping_devices_async(self, devices: List[Inventaris]) -> List[Dict]:
+        """
+        Ping all devices concurrently in one event loop
+        """
+        semaphore = asyncio.Semaphore(self.async_ping_concurrency)
+        cycle_ts = datetime.now().isoformat()
+        return await asyncio.gather(*(self._ping_single_device_async(d, semaphore, cycle_ts) for d in devices))
+    
+    def ping_devices_async(self, devices: List[Inventaris]) -> List[Dict]:
+        """
+        Ping multiple devices using asyncio subprocesses (USE_ASYNC_PING)
+        """
+        start_time = time.monotonic()
+        logger.info(f"Starting async ping for {len(devices)} devices (concurrency {self.async_ping_concurrency})")
+        
+        try:
+            results = asyncio.run(self._ping_devices_async(devices))
+            
+            total_time = time.monotonic() - start_time
+            logger.info(f"Completed async ping in {total_time:.2f}s for {len(results)} devices")
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error in async ping execution, falling back to thread pool: {e}")
+            return None
+    
+    def _select_worker_count(self, device_count: int) -> int:
+        """
+        Jumlah worker untuk cycle ini: tidak lebih dari jumlah device, dikurangi separuh
+        saat failure rate tinggi (host mati menahan worker selama ping_timeout penuh)
+        """
+        workers = min(self.max_workers, max(self.min_workers, device_count))
+        if self.failure_rate > self.high_failure_rate:
+            workers = max(self.min_workers, workers // 2)
+        return workers
+    
+    def _update_failure_rate(self, failures: int, total: int):
+        """Rolling failure rate (EMA) dari cycle thread pool"""
+        if total:
+            self.failure_rate = 0.5 * self.failure_rate + 0.5 * (failures / total)
+    
+    def _ping_wrapped(self, device: Inventaris, cycle_ts: str) -> Tuple[Inventaris, Optional[Dict], Optional[Exception]]:
+        """
+        Jalankan ping_single_device di worker; hasil future membawa device-nya sendiri
+        """
+        try:
+            return device, self.ping_single_device(device, cycle_ts), None
+        except Exception as e:
+            return device, None, e
     
     def ping_devices_concurrent(self, devices: List[Inventaris]) -> List[Dict]:
         """
         Ping multiple devices concurrently using ThreadPoolExecutor
+        (atau asyncio subprocess jika USE_ASYNC_PING aktif)
         """
         if not devices:
             logger.warning("No devices to ping")
             return []
         
-        start_time = time.time()
+        if self.use_batch_socket:
+            results = self.ping_devices_batch_socket(devices)
+            if results is not None:
+                return results
+        
+        if self.use_icmplib:
+            results = self.ping_devices_icmplib(devices)
+            if results is not None:
+                return results
+        
+        if self.use_async_ping:
+            results = self.ping_devices_async(devices)
+            if results is not None:
+                return results
+        
+        start_time = time.monotonic()
+        cycle_ts = datetime.now().isoformat()  # satu timestamp untuk seluruh cycle
         results = []
+        failures = 0
         
-        logger.info(f"Starting concurrent ping for {len(devices)} devices with {self.max_workers} workers")
+        workers = self._select_worker_count(len(devices))
+        self.current_workers = workers
+        logger.info(f"Starting concurrent ping for {len(devices)} devices with {workers} workers")
         
         try:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                # Submit all ping tasks
-                future_to_device = {
-                    executor.submit(self.ping_single_device, device): device 
-                    for device in devices
-                }
-                
-                # Collect results as they complete
-                for future in as_completed(future_to_device):
-                    device = future_to_device[future]
-                    try:
-                        result = future.result()
-                        results.append(result)
-                    except Exception as e:
-                        # Create error result for failed ping
-                        error_result = {
-                            'timestamp': datetime.now().isoformat(),
-                            'device_id': device.id,
-                            'ip_address': device.ip,
-                            'hostname': device.hostname or device.ip,
-                            'ping_success': False,
-                            'response_time_ms': None,
-                            'latency_ms': None,
-                            'error_message': f"Ping execution error: {str(e)}",
-                            'merk': device.merk,
-                            'os': device.os,
-                            'kondisi': device.kondisi,
-                            'id_lokasi': device.id_lokasi,
-                            'processing_time_ms': 0
-                        }
-                        results.append(error_result)
-                        logger.error(f"Error pinging device {device.ip}: {e}")
+            executor = self._executor
+            pending_devices = iter(devices)
+            
+            # Submit ping tasks: maksimal `workers` ping in-flight pada pool bersama
+            in_flight = set()
+            for device in pending_devices:
+                in_flight.add(executor.submit(self._ping_wrapped, device, cycle_ts))
+                if len(in_flight) >= workers:
+                    break
+            
+            # Collect results as they complete, isi slot kosong dengan device berikutnya
+            while in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    device, result, error = future.result()
+                    if error is not None:
+                        # Create error result for failed ping (dari template device)
+                        result = self._make_ping_result(
+                            device, False, None, f"Ping execution error: {str(error)}", _METHOD_PING3, 0, cycle_ts
+                        )
+                        logger.error(f"Error pinging device {device.ip}: {error}")
+                    results.append(result)
+                    if not result['ping_success']:
+                        failures += 1
+                    
+                    next_device = next(pending_devices, None)
+                    if next_device is not None:
+                        in_flight.add(executor.submit(self._ping_wrapped, next_device, cycle_ts))
             
-            total_time = time.time() - start_time
+            self._update_failure_rate(failures, len(results))
+            
+            if self.fping_path:
+                self._recheck_failures_with_fping(devices, results, cycle_ts)
+            
+            total_time = time.monotonic() - start_time
             logger.info(f"Completed concurrent ping in {total_time:.2f}s for {len(results)} devices")
             
             return results
@@ -251,41 +674,77 @@ class PingExecutor:
         if not results:
             return {}
         
-        successful_pings = [r for r in results if r['ping_success']]
-        failed_pings = [r for r in results if not r['ping_success']]
-        response_times = [r['response_time_ms'] for r in successful_pings if r['response_time_ms'] is not None]
-        processing_times = [r['processing_time_ms'] for r in results if r.get('processing_time_ms') is not None]
-        
-        stats = {
-            'total_devices': len(results),
-            'successful_pings': len(successful_pings),
-            'failed_pings': len(failed_pings),
-            'success_rate': round((len(successful_pings) / len(results)) * 100, 2),
-            'average_response_time_ms': round(sum(response_times) / len(response_times), 2) if response_times else None,
-            'min_response_time_ms': min(response_times) if response_times else None,
-            'max_response_time_ms': max(response_times) if response_times else None,
-            'average_processing_time_ms': round(sum(processing_times) / len(processing_times), 2) if processing_times else None,
-            'cycle_duration_ms': max(processing_times) if processing_times else None
-        }
+        # Satu pass tanpa list sementara
+        successful = 0
+        response_sum_us = 0
+        response_count = 0
+        response_min_us = None
+        response_max_us = None
+        processing_sum = 0.0
+        processing_count = 0
+        processing_max = None
         
-        return stats
+        for r in results:
+            if r['ping_success']:
+                successful += 1
+                rt = r['response_time_us']
+                if rt is not None:
+                    response_sum_us += rt
+                    response_count += 1
+                    if response_min_us is None or rt < response_min_us:
+                        response_min_us = rt
+                    if response_max_us is None or rt > response_max_us:
+                        response_max_us = rt
+            
+            pt = r.get('processing_time_ms')
+            if pt is not None:
+                processing_sum += pt
+                processing_count += 1
+                if processing_max is None or pt > processing_max:
+                    processing_max = pt
+        
+        return self.build_ping_statistics(
+            len(results), successful,
+            response_sum_us, response_count, response_min_us, response_max_us,
+            processing_sum, processing_count, processing_max
+        )
+    
+    def build_ping_statistics(self, total: int, successful: int,
+                              response_sum_us: int, response_count: int, response_min_us, response_max_us,
+                              processing_sum: float, processing_count: int, processing_max) -> Dict:
+        """
+        Build statistics dict from running sums (diakumulasi saat mengumpulkan hasil)
+        RTT diakumulasi dalam integer mikrodetik, dikonversi ke ms sekali di sini
+        """
+        return {
+            'total_devices': total,
+            'successful_pings': successful,
+            'failed_pings': total - successful,
+            'success_rate': round((successful / total) * 100, 2) if total else 0,
+            'average_response_time_ms': round(response_sum_us / response_count / 1000, 2) if response_count else None,
+            'min_response_time_ms': response_min_us / 1000 if response_min_us is not None else None,
+            'max_response_time_ms': response_max_us / 1000 if response_max_us is not None else None,
+            'average_processing_time_ms': round(processing_sum / processing_count, 2) if processing_count else None,
+            'cycle_duration_ms': processing_max
+        }
     
     def ping_single_ip(self, ip_address: str) -> Dict:
         """
         Ping a single IP address (for testing purposes)
         """
-        start_time = time.time()
+        start_time = time.monotonic()
         
         try:
-            response_time = ping3.ping(ip_address, timeout=self.ping_timeout)
+            response_time = ping3.ping(self._resolve(ip_address), timeout=self.ping_timeout)
             
             # CRITICAL FIX: ping3 returns False for "Destination host unreachable"
-            # We MUST check if response_time is a number (float), not just "not None"
-            if response_time is not None and response_time is not False and isinstance(response_time, (int, float)):
+            # ping3 hanya mengembalikan float (detik), False, atau None - cukup cek float
+            if isinstance(response_time, float):
+                response_ms = round(response_time * 1000, 2)
                 result = {
                     'success': True,
-                    'response_time_ms': round(response_time * 1000, 2),
-                    'latency_ms': round(response_time * 1000, 2),
+                    'response_time_ms': response_ms,
+                    'latency_ms': response_ms,
                     'error_message': None
                 }
             elif response_time is False:
@@ -294,7 +753,7 @@ class PingExecutor:
                     'success': False,
                     'response_time_ms': None,
                     'latency_ms': None,
-                    'error_message': 'Destination host unreachable'
+                    'error_message': _ERR_UNREACHABLE
                 }
             else:
                 # None means timeout
@@ -302,7 +761,7 @@ class PingExecutor:
                     'success': False,
                     'response_time_ms': None,
                     'latency_ms': None,
-                    'error_message': 'No response (timeout)'
+                    'error_message': _ERR_TIMEOUT
                 }
                 
         except Exception as e:
@@ -313,7 +772,7 @@ class PingExecutor:
                 'error_message': f"Ping error: {str(e)}"
             }
         
-        processing_time = time.time() - start_time
+        processing_time = time.monotonic() - start_time
         
         return {
             'timestamp': datetime.now().isoformat(),
@@ -337,6 +796,16 @@ class PingExecutor:
             'recommended_timeout': max(1, min(10, self.ping_timeout))
         }
     
+    def _get_ping_library(self) -> str:
+        """Name of the ping path used by ping_devices_concurrent"""
+        if self.use_batch_socket:
+            return _METHOD_ICMP_BATCH
+        if self.use_icmplib:
+            return _METHOD_ICMPLIB
+        if self.use_async_ping:
+            return _METHOD_SYSTEM_PING_ASYNC
+        return _METHOD_PING3
+    
     def get_executor_status(self) -> Dict:
         """
         Get current executor status and configuration
@@ -344,7 +813,18 @@ class PingExecutor:
         return {
             'max_workers': self.max_workers,
             'ping_timeout_seconds': self.ping_timeout,
-            'ping_library': 'ping3',
+            'ping_library': self._get_ping_library(),
+            'current_workers': self.current_workers,
+            'failure_rate': round(self.failure_rate, 3),
+            'async_ping_concurrency': self.async_ping_concurrency if (self.use_icmplib or self.use_async_ping) else None,
+            'fping_fallback': bool(self.fping_path),
             'concurrent_execution': True,
             'cross_platform': True
-        }
\ No newline at end of file
+        }
+    
+    def close(self):
+        """
+        Release long-lived resources (ICMP socket, thread pool)
+        """
+        self._batch_pinger.close()
+        self._executor.shutdown(wait=False)
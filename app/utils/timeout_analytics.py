@@ -1,12 +1,28 @@
+import io
 import os
 import csv
+import time
+import atexit
 import logging
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
-from collections import defaultdict
+from collections import defaultdict, deque
+from itertools import groupby
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
 
+# Sisa window binary search (bytes) yang langsung discan linear
+SEEK_LINEAR_BYTES = 4096
+
+# Buffer I/O: scan penuh 1 MiB, append harian 64 KiB (flush tetap dibatch per N snapshot)
+CSV_READ_BUFFER_SIZE = 1 << 20
+APPEND_BUFFER_SIZE = 64 << 10
+
+# Maksimum thread untuk membaca file harian secara paralel (get_multi_day_analytics)
+MULTI_DAY_READ_WORKERS = 4
+
 class TimeoutAnalytics:
     """
     Class untuk mengelola analytics timeout CCTV dalam format time-series
@@ -25,6 +41,21 @@ class TimeoutAnalytics:
             'timestamp', 'total_timeout_devices'
         ]
         
+        # Snapshot dibuffer di deque lalu ditulis per batch (join + satu write) ke file handle
+        # harian yang dibuka sekali. Snapshot datang sekali per ping cycle (PING_INTERVAL, default 5s):
+        # batch ditulis oleh record_timeout_snapshot sendiri saat buffer mencapai N baris atau
+        # baris tertua sudah menunggu flush_interval detik - tanpa thread timer tambahan
+        self.flush_every = getattr(config, 'ANALYTICS_FLUSH_EVERY', 12)
+        self.flush_interval = getattr(config, 'ANALYTICS_FLUSH_INTERVAL', 60)
+        self._buf = deque()
+        self._buf_since = 0.0  # time.monotonic() saat baris pertama masuk buffer
+        self._fh = None
+        self._current_date = None
+        self._file_lock = threading.Lock()
+        
+        # Buffer yang belum ditulis tidak boleh hilang saat proses berhenti
+        atexit.register(self.close)
+        
         logger.info(f"TimeoutAnalytics initialized - Directory: {self.analytics_dir}")
     
     def get_analytics_csv_path(self, date_str: str = None) -> str:
@@ -35,46 +66,91 @@ class TimeoutAnalytics:
         filename = f"{self.analytics_filename_prefix}_{date_str}.csv"
         return os.path.join(self.analytics_dir, filename)
     
-    def _initialize_analytics_csv(self, csv_path: str):
-        """Initialize analytics CSV file with headers if not exists"""
-        if not os.path.exists(csv_path):
+    def _open_for_date(self, date_str: str):
+        """Buka (ulang) file CSV untuk tanggal date_str jika berbeda; header ditulis saat file baru dibuat"""
+        if self._fh is not None and date_str == self._current_date:
+            return
+        
+        self._close_file()
+        
+        csv_path = self.get_analytics_csv_path(date_str)
+        is_new = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+        
+        self._fh = open(csv_path, 'a', newline='', encoding='utf-8', buffering=APPEND_BUFFER_SIZE)
+        self._current_date = date_str
+        
+        if is_new:
+            self._fh.write(','.join(self.analytics_headers) + '\r\n')
+            self._fh.flush()
+            logger.info(f"Created new timeout analytics CSV: {os.path.basename(csv_path)}")
+    
+    def _close_file(self):
+        """Flush dan tutup file handle yang sedang terbuka"""
+        if self._fh is not None:
+            try:
+                self._fh.flush()
+                self._fh.close()
+            except Exception as e:
+                logger.error(f"Error closing analytics CSV: {e}")
+            self._fh = None
+    
+    def _drain_locked(self):
+        """Tulis semua baris di buffer (per tanggal) lalu flush; caller memegang _file_lock"""
+        if not self._buf:
+            return
+        
+        batch = list(self._buf)
+        self._buf.clear()
+        
+        # Buffer bisa melewati tengah malam: tiap baris masuk ke file tanggalnya sendiri
+        for date_str, rows in groupby(batch, key=lambda row: row[0][:10].replace('-', '')):
+            self._open_for_date(date_str)
+            self._fh.write(''.join(f"{ts},{total}\r\n" for ts, total in rows))
+        self._fh.flush()
+    
+    def flush(self):
+        """Tulis snapshot yang masih di buffer ke disk"""
+        with self._file_lock:
+            try:
+                self._drain_locked()
+            except Exception as e:
+                logger.error(f"Error flushing timeout analytics: {e}")
+    
+    def close(self):
+        """Flush dan tutup file analytics (dipanggil saat shutdown)"""
+        with self._file_lock:
             try:
-                with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                    writer = csv.DictWriter(csvfile, fieldnames=self.analytics_headers)
-                    writer.writeheader()
-                logger.info(f"Created new timeout analytics CSV: {os.path.basename(csv_path)}")
+                self._drain_locked()
             except Exception as e:
-                logger.error(f"Error creating analytics CSV: {e}")
+                logger.error(f"Error flushing timeout analytics: {e}")
+            self._close_file()
     
     def record_timeout_snapshot(self, timeout_data: Dict[str, Dict], 
-                               previous_timeout_ips: set = None) -> bool:
+                               previous_timeout_ips: set = None, *,
+                               now: Optional[datetime] = None) -> bool:
         """
         Record current timeout snapshot to analytics CSV
         Args:
             timeout_data: Current timeout data from TimeoutTracker
             previous_timeout_ips: Set of IPs that were timing out in previous snapshot
+            now: Waktu cycle dari caller (default: datetime.now())
         """
         try:
-            current_time = datetime.now()
-            csv_path = self.get_analytics_csv_path()
-            
-            # Initialize CSV if needed
-            self._initialize_analytics_csv(csv_path)
+            total_timeout_devices = len(timeout_data)
             
-            # Calculate analytics metrics
-            current_timeout_ips = set(timeout_data.keys())
-            total_timeout_devices = len(current_timeout_ips)
-            
-            # Only 2 fields in analytics record
-            analytics_record = {
-                'timestamp': current_time.isoformat(),
-                'total_timeout_devices': total_timeout_devices
-            }
-            
-            # Append to CSV
-            with open(csv_path, 'a', newline='', encoding='utf-8') as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=self.analytics_headers)
-                writer.writerow(analytics_record) 
+            with self._file_lock:
+                # Only 2 fields in analytics record
+                # Timestamp naive ISO (tanpa timezone) - _stream_records membandingkan sebagai string
+                # Kedua field tidak pernah berisi koma/quote/newline: ditulis langsung tanpa csv.writer
+                # (terminator \r\n sama dengan default csv.writer untuk file lama)
+                now_iso = (now or datetime.now()).isoformat(timespec='seconds')
+                if not self._buf:
+                    self._buf_since = time.monotonic()
+                self._buf.append((now_iso, total_timeout_devices))
+                
+                if (len(self._buf) >= self.flush_every
+                        or time.monotonic() - self._buf_since >= self.flush_interval):
+                    self._drain_locked()
             
             logger.debug(f"Recorded timeout analytics: {total_timeout_devices} devices")
             
@@ -97,32 +173,20 @@ class TimeoutAnalytics:
             
             csv_path = self.get_analytics_csv_path(date_str)
             
+            # Snapshot yang belum di-flush harus terlihat oleh pembaca
+            self.flush()
+            
             if not os.path.exists(csv_path):
                 logger.warning(f"Analytics CSV file not found: {os.path.basename(csv_path)}")
                 return []
             
             # Calculate time range
-            now = datetime.now()
-            start_time = now - timedelta(hours=hours)
-            
-            analytics_data = []
+            start_time = datetime.now() - timedelta(hours=hours)
             
-            with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        record_time = datetime.fromisoformat(row['timestamp'])
-                        
-                        # Filter by time range
-                        if record_time >= start_time:
-                            # Convert numeric fields - only 1 numeric field now
-                            row['total_timeout_devices'] = int(row['total_timeout_devices'])
-                            analytics_data.append(row)
-                            
-                    except (ValueError, KeyError) as e:
-                        logger.warning(f"Skipping invalid analytics record: {e}")
-                        continue
+            analytics_data = [
+                {'timestamp': ts_str, 'total_timeout_devices': count}
+                for ts_str, count in self._stream_records(csv_path, start_time, seek=hours < 24)
+            ]
             
             logger.info(f"Retrieved {len(analytics_data)} analytics records from last {hours} hours")
             return analytics_data
@@ -131,6 +195,13 @@ class TimeoutAnalytics:
             logger.error(f"Error getting analytics data: {e}")
             return []
 
+    def _parse_day_file(self, date_str: str, start_time: datetime) -> List[tuple]:
+        """Baca satu file analytics harian sebagai list (timestamp, total_timeout_devices)"""
+        csv_path = self.get_analytics_csv_path(date_str)
+        if not os.path.exists(csv_path):
+            return []
+        return list(self._stream_records(csv_path, start_time))
+    
     def get_multi_day_analytics(self, days: int = 7) -> List[Dict]:
         """
         Get analytics data spanning multiple days
@@ -138,18 +209,28 @@ class TimeoutAnalytics:
             days: Number of days to retrieve (default: 7)
         """
         try:
-            all_data = []
             current_date = datetime.now()
+            start_time = current_date - timedelta(days=days)
             
-            for i in range(days):
-                date_to_check = current_date - timedelta(days=i)
-                date_str = date_to_check.strftime('%Y%m%d')
-                
-                day_data = self.get_analytics_data(hours=24, date_str=date_str)
-                all_data.extend(day_data)
+            # File harian sudah urut waktu: urutkan hari dari terlama ke terbaru,
+            # hasil gabungan langsung urut tanpa sort ulang
+            date_strs = [(current_date - timedelta(days=i)).strftime('%Y%m%d') for i in range(days - 1, -1, -1)]
+            
+            self.flush()
+            
+            # I/O per hari di-overlap dengan thread pool kecil; map() menjaga urutan hari
+            if len(date_strs) > 1:
+                with ThreadPoolExecutor(max_workers=min(len(date_strs), MULTI_DAY_READ_WORKERS),
+                                        thread_name_prefix='analytics') as executor:
+                    day_results = list(executor.map(lambda d: self._parse_day_file(d, start_time), date_strs))
+            else:
+                day_results = [self._parse_day_file(d, start_time) for d in date_strs]
             
-            # Sort by timestamp
-            all_data.sort(key=lambda x: x['timestamp'])
+            all_data = [
+                {'timestamp': ts_str, 'total_timeout_devices': count}
+                for day_records in day_results
+                for ts_str, count in day_records
+            ]
             
             logger.info(f"Retrieved {len(all_data)} analytics records from last {days} days")
             return all_data
@@ -158,40 +239,110 @@ class TimeoutAnalytics:
             logger.error(f"Error getting multi-day analytics: {e}")
             return []
     
+    def _seek_to_time(self, fh, start_str: str) -> int:
+        """
+        Binary search offset record pertama dengan timestamp >= start_str
+        File analytics di-append berurutan waktu, jadi offset bisa di-bisect;
+        setiap record sebelum offset hasil dijamin < start_str
+        """
+        start = start_str.encode('ascii')
+        fh.seek(0)
+        fh.readline()  # header
+        lo = fh.tell()
+        hi = os.fstat(fh.fileno()).st_size
+        
+        while hi - lo > SEEK_LINEAR_BYTES:
+            mid = (lo + hi) // 2
+            fh.seek(mid)
+            fh.readline()  # resync ke awal record berikutnya
+            line_start = fh.tell()
+            if line_start >= hi:
+                break
+            
+            line = fh.readline()
+            if line.split(b',', 1)[0] < start:
+                lo = fh.tell()
+            else:
+                hi = line_start
+        
+        fh.seek(lo)
+        return lo
+    
+    def _stream_records(self, csv_path: str, start_time: datetime, seek: bool = False):
+        """
+        Yield (timestamp, total_timeout_devices) untuk record >= start_time
+        csv.reader posisional (tanpa dict per baris), header dilewati
+        Filter waktu memakai perbandingan string: semua timestamp ditulis oleh
+        record_timeout_snapshot sebagai isoformat naive (tanpa suffix timezone; presisi
+        detik, baris lama mikrodetik), sehingga urutan leksikografis = urutan waktu
+        seek=True: lompat langsung ke record pertama >= start_time (query < 24 jam)
+        """
+        start_str = start_time.isoformat()
+        
+        # Bisect (seek) membaca potongan kecil: buffer default; scan penuh pakai buffer besar
+        buffering = -1 if seek else CSV_READ_BUFFER_SIZE
+        with open(csv_path, 'rb', buffering=buffering) as raw:
+            if seek:
+                self._seek_to_time(raw, start_str)
+            else:
+                raw.readline()  # header
+            
+            reader = csv.reader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+            
+            for row in reader:
+                try:
+                    ts_str = row[0]
+                    if ts_str >= start_str:
+                        yield ts_str, int(row[1])
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"Skipping invalid analytics record: {e}")
+                    continue
+    
     def get_analytics_summary(self, hours: int = 24) -> Dict:
         """
-        Get summary statistics for analytics data
+        Get summary statistics for analytics data (single pass, tanpa menyimpan record)
         """
         try:
-            data = self.get_analytics_data(hours=hours)
+            date_str = datetime.now().strftime('%Y%m%d')
+            csv_path = self.get_analytics_csv_path(date_str)
             
-            if not data:
+            # Snapshot yang belum di-flush harus ikut dihitung
+            self.flush()
+            
+            n = 0
+            total = 0
+            peak = 0
+            first = None
+            last = None
+            
+            if os.path.exists(csv_path):
+                start_time = datetime.now() - timedelta(hours=hours)
+                for ts_str, count in self._stream_records(csv_path, start_time, seek=hours < 24):
+                    if first is None:
+                        first = ts_str
+                    last = ts_str
+                    n += 1
+                    total += count
+                    if count > peak:
+                        peak = count
+            
+            if not n:
                 return {
                     'total_records': 0,
                     'time_range_hours': hours,
                     'avg_timeout_devices': 0,
-                    'peak_timeout_devices': 0,
-                    'avg_critical_devices': 0,
-                    'peak_critical_devices': 0
+                    'peak_timeout_devices': 0
                 }
             
-            # Calculate summary statistics
-            timeout_counts = [record['total_timeout_devices'] for record in data]
-            critical_counts = [record['critical_devices_count'] for record in data]
-            
-            summary = {
-                'total_records': len(data),
+            return {
+                'total_records': n,
                 'time_range_hours': hours,
-                'avg_timeout_devices': round(sum(timeout_counts) / len(timeout_counts), 2),
-                'peak_timeout_devices': max(timeout_counts),
-                'avg_critical_devices': round(sum(critical_counts) / len(critical_counts), 2),
-                'peak_critical_devices': max(critical_counts),
-                'first_record': data[0]['timestamp'],
-                'last_record': data[-1]['timestamp']
+                'avg_timeout_devices': round(total / n, 2),
+                'peak_timeout_devices': peak,
+                'first_record': first,
+                'last_record': last
             }
             
-            return summary
-            
         except Exception as e:
             logger.error(f"Error getting analytics summary: {e}")
             return {}
@@ -202,55 +353,31 @@ class TimeoutAnalytics:
             if not os.path.exists(self.analytics_dir):
                 return
             
-            current_time = datetime.now()
+            now = time.time()
+            # Umur (hari penuh) > keep_days  <=>  mtime <= cutoff
+            cutoff = now - (keep_days + 1) * 86400
             deleted_files = 0
             
-            for filename in os.listdir(self.analytics_dir):
-                if filename.startswith(self.analytics_filename_prefix) and filename.endswith('.csv'):
-                    file_path = os.path.join(self.analytics_dir, filename)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
-                    
-                    # Calculate age in days
-                    age_days = (current_time - file_time).days
-                    
-                    if age_days > keep_days:
-                        try:
-                            os.remove(file_path)
-                            deleted_files += 1
-                            logger.info(f"Deleted old analytics file: {filename} (age: {age_days} days)")
-                        except Exception as e:
-                            logger.error(f"Error deleting analytics file {filename}: {e}")
-            
-            if deleted_files > 0:
-                logger.info(f"Cleaned up {deleted_files} old analytics files")
-                
-        except Exception as e:
-            logger.error(f"Error during analytics cleanup: {e}")
-            
-            for filename in os.listdir(self.analytics_dir):
-                if filename.startswith(self.analytics_filename_prefix) and filename.endswith('.csv'):
-                    file_path = os.path.join(self.analytics_dir, filename)
-                    file_time = datetime.fromtimestamp(os.path.getmtime(file_path))
+            with os.scandir(self.analytics_dir) as entries:
+                for entry in entries:
+                    filename = entry.name
+                    if not (filename.startswith(self.analytics_filename_prefix) and filename.endswith('.csv')):
+                        continue
                     
-                    # Calculate age in days
-                    age_days = (current_time - file_time).days
+                    mtime = entry.stat().st_mtime
+                    if mtime > cutoff:
+                        continue
                     
-                    if age_days > keep_days:
-                        try:
-                            os.remove(file_path)
-                            deleted_files += 1
-                            logger.info(f"Deleted old analytics file: {filename} (age: {age_days} days)")
-                        except Exception as e:
-                            logger.error(f"Error deleting analytics file {filename}: {e}")
+                    age_days = int((now - mtime) // 86400)
+                    try:
+                        os.remove(entry.path)
+                        deleted_files += 1
+                        logger.info(f"Deleted old analytics file: {filename} (age: {age_days} days)")
+                    except Exception as e:
+                        logger.error(f"Error deleting analytics file {filename}: {e}")
             
             if deleted_files > 0:
                 logger.info(f"Cleaned up {deleted_files} old analytics files")
                 
         except Exception as e:
             logger.error(f"Error during analytics cleanup: {e}")
-            logger.info(f"Deleted old analytics file: {filename} (age: {age_days} days)")
-            if deleted_files > 0:
-                logger.info(f"Cleaned up {deleted_files} old analytics files")
-                
-        except Exception as e:
-            logger.error(f"Error during analytics cleanup: {e}")
@@ -1,8 +1,14 @@
 import os
+import sys
 import csv
+import time
+import atexit
+import queue
+import sqlite3
 import logging
 import threading
 from datetime import datetime, timedelta
+from itertools import islice
 from typing import List, Dict, Optional
 
 try:
@@ -13,6 +19,43 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Buffer I/O file CSV: baca/tulis penuh 1 MiB
+CSV_BUFFER_SIZE = 1 << 20
+
+# Batas "high timeouts" untuk get_timeout_summary (> N consecutive)
+HIGH_TIMEOUT_THRESHOLD = 10
+
+# Template entry timeout baru (urutan key = timeout_headers); dict.copy() meng-clone
+# layout hash table sekaligus, lebih murah daripada literal 10 key
+_NEW_ENTRY_TEMPLATE = dict.fromkeys((
+    'ip_address', 'hostname', 'device_id', 'merk', 'os', 'kondisi',
+    'consecutive_timeouts', 'first_timeout', 'last_timeout', 'last_updated',
+), '')
+
+TIMEOUT_DB_FILENAME = 'timeout_tracking.db'
+
+
+def read_timeout_entry(timeout_dir: str, ip_address: str) -> Dict:
+    """
+    Baca entry timeout satu IP langsung dari SQLite (WAL, read-only) - untuk pembaca di luar
+    proses tracker; timeout_tracking.csv hanya export periodik dan bisa tertinggal
+    """
+    db_path = os.path.join(timeout_dir, TIMEOUT_DB_FILENAME)
+    if not os.path.exists(db_path):
+        return {}
+    
+    headers = list(_NEW_ENTRY_TEMPLATE)
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        row = conn.execute(
+            f"SELECT {', '.join(headers)} FROM timeout_tracking WHERE ip_address = ?",
+            (ip_address,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return dict(zip(headers, row)) if row else {}
+
+
 def format_indonesian_date(dt: datetime) -> str:
     """
     Format datetime ke format Indonesia: 21 Oktober 2025
@@ -41,6 +84,8 @@ class TimeoutTracker:
         self.timeout_dir = getattr(config, 'CSV_OUTPUT_DIR', 'ping_results')
         self.timeout_filename = 'timeout_tracking.csv'
         self.timeout_csv_path = os.path.join(self.timeout_dir, self.timeout_filename)
+        self.db_filename = TIMEOUT_DB_FILENAME
+        self.db_path = os.path.join(self.timeout_dir, self.db_filename)
         self.alerted_list_filename = 'whatsapp_alerted_list.csv'
         self.alerted_list_csv_path = os.path.join(self.timeout_dir, self.alerted_list_filename)
         
@@ -48,12 +93,34 @@ class TimeoutTracker:
         self._timeout_file_lock = threading.Lock()
         self._alerted_file_lock = threading.Lock()
         self._update_tracking_lock = threading.Lock()  # CRITICAL: Prevent concurrent updates
+        self._db_lock = threading.Lock()
+        
+        # Persistence di SQLite (WAL): tiap cycle hanya baris yang berubah yang di-upsert/delete;
+        # timeout_tracking.csv hanya artefak export, ditulis ulang saat compact() (periodik)
+        self.compact_interval = getattr(config, 'TIMEOUT_COMPACT_INTERVAL', 3600)
+        self._db: Optional[sqlite3.Connection] = None
+        self._last_compaction = time.monotonic()
+        self._export_dirty = False  # True jika DB punya perubahan yang belum di-export ke CSV
+        
+        # Perubahan beberapa cycle digabung di memory ({ip: entry, None = delete}) dan di-commit
+        # ke SQLite paling sering sekali per TIMEOUT_PERSIST_INTERVAL detik
+        self.persist_interval = getattr(config, 'TIMEOUT_PERSIST_INTERVAL', 30)
+        self._pending_changes: Dict[str, Optional[Dict]] = {}
+        self._last_persist = time.monotonic()
+        
+        # Compaction periodik dijalankan thread background (bukan di jalur ping);
+        # queue maxsize=1: request yang datang saat masih ada yang antri digabung
+        self._compact_queue = queue.Queue(maxsize=1)
+        self._compact_thread = None
 
         # WhatsApp Alert Configuration
         self.whatsapp_enabled = getattr(config, 'ENABLE_WHATSAPP_TIMEOUT_ALERTS', True)
         self.whatsapp_threshold = getattr(config, 'WHATSAPP_TIMEOUT_THRESHOLD', 20)
         self.whatsapp_cooldown_minutes = getattr(config, 'WHATSAPP_COOLDOWN_MINUTES', 60)
         
+        # Watzap service di-resolve sekali saat alert pertama (import lazy: hindari circular import routes)
+        self._watzap_service = None
+        
         # Incident Management Configuration
         self.incident_enabled = getattr(config, 'ENABLE_INCIDENT_CREATION', True)
         
@@ -61,16 +128,24 @@ class TimeoutTracker:
         os.makedirs(self.timeout_dir, exist_ok=True)
         
         # CSV headers for timeout tracking
-        self.timeout_headers = [
-            'ip_address', 'hostname', 'device_id', 'merk', 'os', 'kondisi',
-            'consecutive_timeouts', 'first_timeout', 'last_timeout', 'last_updated',
-        ]
+        self.timeout_headers = [sys.intern(field) for field in _NEW_ENTRY_TEMPLATE]
         self.alerted_list_headers = ['ip_address', 'hostname', 'device_id',]
         
         # Initialize CSV file if not exists
         self._initialize_timeout_csv()
         self._initialize_alerted_list_csv()
         
+        # State timeout in-memory (authoritative): dimuat dari SQLite (atau migrasi sekali dari CSV)
+        self._state: Dict[str, Dict] = self._load_state()
+        
+        # Alerted list in-memory (dibaca sekali); file CSV hanya ditulis saat isinya berubah
+        # karena IncidentManager membaca whatsapp_alerted_list.csv langsung
+        self._alerted: Dict[str, Dict] = self._read_alerted_list()
+        
+        # Agregat summary (count, sum, max, high) di-maintain bersama state - satu tuple
+        # di-swap sekaligus agar get_timeout_summary O(1) dan konsisten
+        self._summary_agg = self._build_summary_agg(self._state)
+        
         # Initialize timeout analytics
         from app.utils.timeout_analytics import TimeoutAnalytics
         self.analytics = TimeoutAnalytics(config)
@@ -87,6 +162,9 @@ class TimeoutTracker:
         # Track previous timeout IPs for analytics
         self.previous_timeout_ips = set()
         
+        # Perubahan yang masih di-debounce tidak boleh hilang saat proses berhenti normal
+        atexit.register(self.flush)
+        
         logger.info(f"TimeoutTracker initialized - CSV: {self.timeout_csv_path}")
         logger.info(f"Alerted List initialized - CSV: {self.alerted_list_csv_path}")
         logger.info(f"WhatsApp alerts: {'enabled' if self.whatsapp_enabled else 'disabled'} (threshold: {self.whatsapp_threshold})")
@@ -150,15 +228,21 @@ class TimeoutTracker:
                         logger.error(f"❌ CSV still too small after retry - returning empty")
                         return {}
                 
-                with open(self.timeout_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+                with open(self.timeout_csv_path, 'r', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csvfile:
                     self._lock_file(csvfile)  # File lock (Unix)
                     try:
-                        reader = csv.DictReader(csvfile)
+                        # csv.reader posisional: satu dict per baris (DictReader + dict(row) = dua),
+                        # key di-intern sehingga semua baris berbagi objek string header yang sama
+                        reader = csv.reader(csvfile)
+                        header = [sys.intern(field) for field in next(reader, [])]
+                        ip_index = header.index('ip_address') if 'ip_address' in header else None
                         row_count = 0
                         for row in reader:
-                            ip_address = row.get('ip_address')
+                            if ip_index is None or len(row) <= ip_index:
+                                continue
+                            ip_address = row[ip_index]
                             if ip_address:  # Validate row has IP
-                                timeout_data[ip_address] = dict(row)
+                                timeout_data[ip_address] = dict(zip(header, row))
                                 row_count += 1
                         
                         # Validation: If file is large but we read 0 rows, something is wrong
@@ -177,29 +261,18 @@ class TimeoutTracker:
                 logger.error(f"Traceback: {traceback.format_exc()}")
                 return {}
     
-    def _write_timeout_data(self, timeout_data: Dict[str, Dict]):
-        """Write timeout data to CSV with file locking and atomic write"""
+    def _write_timeout_data(self, timeout_data: Dict[str, Dict], durable: bool = False) -> bool:
+        """
+        Write timeout data to CSV with file locking and atomic write
+        Snapshot kosong valid: data berasal dari SQLite yang authoritative (lihat compact())
+        durable: fsync sebelum rename - hanya saat shutdown; export periodik cukup atomic
+        (os.replace), data authoritative ada di SQLite
+        """
         with self._timeout_file_lock:  # Thread lock
             # CRITICAL: Also lock the ACTUAL CSV file during entire operation
             # This prevents other processes from reading while we're updating
             lock_file = None
             try:
-                # CRITICAL SAFETY CHECK: Don't clear non-empty CSV!
-                # This prevents race condition where empty data overwrites valid data
-                if not timeout_data and os.path.exists(self.timeout_csv_path):
-                    try:
-                        current_size = os.path.getsize(self.timeout_csv_path)
-                        # If CSV has content (> 200 bytes = header + at least 1 row)
-                        if current_size > 200:
-                            logger.error("🚨🚨🚨 PREVENTED DATA LOSS! 🚨🚨🚨")
-                            logger.error(f"   Refusing to clear non-empty CSV (size: {current_size} bytes)")
-                            logger.error(f"   timeout_data is EMPTY but CSV has content!")
-                            logger.error(f"   This is likely a RACE CONDITION or BUG!")
-                            logger.error(f"   CSV NOT MODIFIED - preserving existing data")
-                            return  # ABORT write - preserve existing data!
-                    except Exception as check_err:
-                        logger.error(f"Error checking CSV size: {check_err}")
-                
                 # CRITICAL FIX: Lock the actual CSV file BEFORE starting write operation
                 # This prevents other processes from reading stale data during update
                 if os.path.exists(self.timeout_csv_path):
@@ -210,46 +283,30 @@ class TimeoutTracker:
                 # Atomic write: write to temp file first, then rename
                 temp_path = self.timeout_csv_path + '.tmp'
                 
-                # Log warning if writing empty data
-                if not timeout_data:
-                    logger.warning(f"⚠️  Writing EMPTY timeout_data to CSV - CSV will be cleared!")
-                    logger.warning(f"   If this happens frequently, it indicates a BUG!")
-                
-                with open(temp_path, 'w', newline='', encoding='utf-8') as csvfile:
+                with open(temp_path, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csvfile:
                     self._lock_file(csvfile)  # File lock (Unix)
                     try:
-                        writer = csv.DictWriter(csvfile, fieldnames=self.timeout_headers)
-                        writer.writeheader()
+                        # csv.writer posisional (tanpa mapping fieldnames per baris seperti DictWriter)
+                        writer = csv.writer(csvfile)
+                        writer.writerow(self.timeout_headers)
                         
-                        # Sort by consecutive_timeouts (descending) for easier monitoring
-                        sorted_data = sorted(
-                            timeout_data.values(), 
-                            key=lambda x: int(x.get('consecutive_timeouts', 0)), 
-                            reverse=True
-                        )
+                        # Urutan baris tidak bermakna; tulis sesuai urutan dict
+                        # (compact() yang mengurutkan untuk kemudahan monitoring)
+                        writer.writerows(map(self._row_to_csv, timeout_data.values()))
                         
-                        for row_data in sorted_data:
-                            writer.writerow(row_data)
-                        
-                        # Force flush to disk
-                        csvfile.flush()
-                        os.fsync(csvfile.fileno())
+                        if durable:
+                            csvfile.flush()
+                            os.fsync(csvfile.fileno())
                     finally:
                         self._unlock_file(csvfile)
                 
                 # File is closed here (exited 'with' block)
                 # Now it's safe to do atomic rename
                 
-                # Atomic rename (atomic operation on Unix/Linux)
+                # Atomic rename (atomic operation on Unix/Linux): pembaca melihat file lama
+                # atau file baru utuh, tidak pernah setengah tertulis
                 os.replace(temp_path, self.timeout_csv_path)
                 
-                # CRITICAL: Ensure file system sync (especially important on CentOS)
-                try:
-                    import time
-                    time.sleep(0.01)  # 10ms delay for FS sync
-                except:
-                    pass
-                
                 logger.debug(f"Written {len(timeout_data)} timeout entries to CSV (atomic)")
                 
                 # VALIDATION: Verify write succeeded
@@ -261,6 +318,8 @@ class TimeoutTracker:
                     else:
                         logger.debug(f"✅ Write validated: {actual_size} bytes for {len(timeout_data)} entries")
                 
+                return True
+                
             except Exception as e:
                 logger.error(f"Error writing timeout CSV: {e}")
                 # Cleanup temp file if exists
@@ -270,6 +329,7 @@ class TimeoutTracker:
                         os.remove(temp_path)
                     except:
                         pass
+                return False
             finally:
                 # CRITICAL: Release lock on actual CSV file
                 if lock_file:
@@ -280,6 +340,205 @@ class TimeoutTracker:
                     except:
                         pass
 
+    def _get_db(self) -> sqlite3.Connection:
+        """
+        Buka koneksi SQLite sekali (dipakai ulang, selalu di bawah _db_lock)
+        WAL + synchronous=NORMAL: commit per cycle tanpa fsync penuh, tetap aman dari korupsi saat crash
+        """
+        if self._db is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            columns = ', '.join(
+                'ip_address TEXT PRIMARY KEY' if field == 'ip_address'
+                else 'consecutive_timeouts INTEGER NOT NULL DEFAULT 0' if field == 'consecutive_timeouts'
+                else f'{field} TEXT'
+                for field in self.timeout_headers
+            )
+            conn.execute(f'CREATE TABLE IF NOT EXISTS timeout_tracking ({columns})')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_timeout_tracking_count '
+                         'ON timeout_tracking (consecutive_timeouts DESC)')
+            self._db = conn
+        return self._db
+    
+    def _select_db_state(self) -> Dict[str, Dict]:
+        """Semua entry dari SQLite, terurut consecutive_timeouts descending via index (caller memegang _db_lock)"""
+        cursor = self._get_db().execute(
+            f"SELECT {', '.join(self.timeout_headers)} FROM timeout_tracking "
+            f"ORDER BY consecutive_timeouts DESC"
+        )
+        return {row[0]: dict(zip(self.timeout_headers, row)) for row in cursor}
+    
+    def _load_db_state(self) -> Dict[str, Dict]:
+        """Load semua entry dari SQLite (terurut consecutive_timeouts descending)"""
+        with self._db_lock:
+            return self._select_db_state()
+    
+    def _load_state(self) -> Dict[str, Dict]:
+        """
+        Bangun state timeout saat startup dari SQLite
+        Jika DB belum ada: migrasi sekali dari timeout_tracking.csv, lalu seed DB
+        """
+        migrate = not os.path.exists(self.db_path)
+        if migrate:
+            state = self._read_timeout_data()
+        else:
+            try:
+                state = self._load_db_state()
+            except Exception as e:
+                logger.error(f"Error loading timeout state from SQLite - falling back to CSV: {e}")
+                state = self._read_timeout_data()
+        
+        # consecutive_timeouts disimpan sebagai int di memory; string hanya saat tulis CSV
+        for ip_address, entry in list(state.items()):
+            try:
+                state[ip_address] = self._csv_to_row(entry)
+            except (TypeError, ValueError):
+                logger.warning(f"Dropping timeout entry with invalid counter: {ip_address}")
+                del state[ip_address]
+        
+        if migrate:
+            if self._persist_changes(list(state.values()), []):
+                logger.info(f"Migrated {len(state)} timeout entries to SQLite: {self.db_filename}")
+                self._export_dirty = False  # CSV sudah berisi state yang sama
+            else:
+                # DB kosong tidak boleh dianggap authoritative di startup berikutnya: ulangi migrasi
+                with self._db_lock:
+                    if self._db is not None:
+                        self._db.close()
+                        self._db = None
+                for path in (self.db_path, self.db_path + '-wal', self.db_path + '-shm'):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+        return state
+    
+    def _row_to_csv(self, entry: Dict) -> List:
+        """Entry in-memory -> list nilai posisional (urutan timeout_headers) untuk CSV/SQLite"""
+        return [entry.get(field, '') for field in self.timeout_headers]
+    
+    @staticmethod
+    def _csv_to_row(entry: Dict) -> Dict:
+        """
+        Entry hasil parse CSV/SQLite -> entry in-memory (consecutive_timeouts sebagai int)
+        """
+        return dict(entry, consecutive_timeouts=int(entry.get('consecutive_timeouts') or 0))
+    
+    @staticmethod
+    def _build_summary_agg(state: Dict[str, Dict]) -> tuple:
+        """Hitung ulang agregat summary (count, sum, max, high) dari state - O(N), hanya saat load/reset"""
+        counts = [entry['consecutive_timeouts'] for entry in state.values()]
+        return (
+            len(counts),
+            sum(counts),
+            max(counts, default=0),
+            sum(1 for count in counts if count > HIGH_TIMEOUT_THRESHOLD),
+        )
+    
+    def _persist_changes(self, upserts: List[Dict], deletes: List[str]) -> bool:
+        """Upsert/delete hanya baris yang berubah di cycle ini ke SQLite (satu transaksi)"""
+        if not upserts and not deletes:
+            return True
+        
+        with self._db_lock:
+            try:
+                conn = self._get_db()
+                conn.execute('BEGIN')
+                try:
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO timeout_tracking ({', '.join(self.timeout_headers)}) "
+                        f"VALUES ({', '.join('?' * len(self.timeout_headers))})",
+                        map(self._row_to_csv, upserts)
+                    )
+                    conn.executemany(
+                        'DELETE FROM timeout_tracking WHERE ip_address = ?',
+                        ((ip_address,) for ip_address in deletes)
+                    )
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                self._export_dirty = True
+                return True
+            except Exception as e:
+                logger.error(f"Error persisting timeout changes to SQLite: {e}")
+                return False
+    
+    def compact(self, durable: bool = False) -> bool:
+        """
+        Export state lengkap ke timeout_tracking.csv (atomic; fsync hanya jika durable) untuk pembaca CSV/monitoring
+        SQLite tetap authoritative; CSV boleh tertinggal maksimal TIMEOUT_COMPACT_INTERVAL detik
+        """
+        with self._db_lock:
+            # Baris dibaca dari SQLite (sudah committed) lewat index consecutive_timeouts DESC:
+            # urutan untuk monitoring tanpa sort di Python
+            try:
+                snapshot = self._select_db_state()
+            except Exception as e:
+                logger.error(f"Error reading timeout state from SQLite for CSV export: {e}")
+                return False
+            
+            if not self._write_timeout_data(snapshot, durable=durable):
+                logger.error("Timeout CSV export failed - will retry on next interval")
+                return False
+            self._export_dirty = False
+            self._last_compaction = time.monotonic()
+        logger.info(f"Exported timeout tracking: {len(snapshot)} entries written to {self.timeout_filename}")
+        return True
+    
+    def _compaction_worker(self):
+        """Thread background: jalankan compact() setiap ada request di queue"""
+        while True:
+            self._compact_queue.get()
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error in background timeout compaction: {e}")
+    
+    def _request_compaction(self):
+        """Minta compaction di background tanpa memblok cycle ping"""
+        if self._compact_thread is None:
+            self._compact_thread = threading.Thread(
+                target=self._compaction_worker, name='timeout-compact', daemon=True
+            )
+            self._compact_thread.start()
+        
+        # Interval dihitung dari saat request (bukan saat selesai) agar tidak di-request tiap cycle
+        self._last_compaction = time.monotonic()
+        try:
+            self._compact_queue.put_nowait(True)
+        except queue.Full:
+            pass  # Sudah ada request yang antri - state terbaru akan ikut tertulis
+    
+    def _flush_pending_changes(self) -> bool:
+        """Commit perubahan yang tertunda ke SQLite (caller memegang _update_tracking_lock)"""
+        self._last_persist = time.monotonic()
+        if not self._pending_changes:
+            return True
+        
+        upserts = [entry for entry in self._pending_changes.values() if entry is not None]
+        deletes = [ip for ip, entry in self._pending_changes.items() if entry is None]
+        if not self._persist_changes(upserts, deletes):
+            return False  # Tetap di pending, dicoba lagi di cycle berikutnya
+        self._pending_changes = {}
+        return True
+    
+    def flush(self) -> bool:
+        """Paksa commit perubahan yang tertunda ke SQLite (dipanggil saat shutdown via atexit)"""
+        with self._update_tracking_lock:
+            return self._flush_pending_changes()
+    
+    def close(self):
+        """Commit perubahan tertunda, export state ke CSV dan tutup koneksi SQLite (dipanggil saat shutdown)"""
+        with self._update_tracking_lock:
+            self._flush_pending_changes()
+            self.compact(durable=True)
+            with self._db_lock:
+                if self._db is not None:
+                    self._db.close()
+                    self._db = None
+    
     def _read_alerted_list(self) -> Dict[str, datetime]:
         """Read last WhatsApp alert times from internal tracking with file locking"""
         alerted_data = {}
@@ -288,7 +547,7 @@ class TimeoutTracker:
         
         with self._alerted_file_lock:  # Thread lock
             try:
-                with open(self.alerted_list_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
+                with open(self.alerted_list_csv_path, 'r', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csvfile:
                     self._lock_file(csvfile)  # File lock (Unix)
                     try:
                         reader = csv.DictReader(csvfile)
@@ -312,15 +571,15 @@ class TimeoutTracker:
                 # Atomic write: write to temp file first, then rename
                 temp_path = self.alerted_list_csv_path + '.tmp'
                 
-                with open(temp_path, 'w', newline='', encoding='utf-8') as csvfile:
+                with open(temp_path, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as csvfile:
                     self._lock_file(csvfile)  # File lock (Unix)
                     try:
-                        writer = csv.DictWriter(csvfile, fieldnames=self.alerted_list_headers)
-                        writer.writeheader()
+                        headers = self.alerted_list_headers
+                        writer = csv.writer(csvfile)
+                        writer.writerow(headers)
                         
-                        # Write all alerted devices
-                        for row_data in alerted_data.values():
-                            writer.writerow(row_data)
+                        # Write all alerted devices (satu writerows, baris posisional)
+                        writer.writerows([entry.get(field, '') for field in headers] for entry in alerted_data.values())
                     finally:
                         self._unlock_file(csvfile)
                 
@@ -357,9 +616,9 @@ class TimeoutTracker:
             return False
 
         # Cek apakah sudah pernah di-alert sebelumnya
-        # Use provided alerted_data to avoid re-reading file
+        # Use provided alerted_data (salinan cycle berjalan), default ke alerted list in-memory
         if alerted_data is None:
-            alerted_data = self._read_alerted_list()
+            alerted_data = self._alerted
         
         if ip_address in alerted_data:
             logger.info(f"🚫 Device {ip_address} ALREADY ALERTED - skipping (timeouts: {consecutive_timeouts}x, threshold: {self.whatsapp_threshold})")
@@ -369,14 +628,19 @@ class TimeoutTracker:
         logger.info(f"✅ Device {ip_address} ready for alert (consecutive_timeouts: {consecutive_timeouts}, threshold: {self.whatsapp_threshold})")
         return True
     
+    def _get_watzap_service(self):
+        """Watzap service singleton, di-cache setelah lookup pertama yang berhasil"""
+        if self._watzap_service is None:
+            from app.routes.watzap_routes import get_watzap_service
+            self._watzap_service = get_watzap_service()
+        return self._watzap_service
+    
     def _send_whatsapp_timeout_alert(self, device_data: Dict) -> bool:
         """
         Send WhatsApp alert for timeout device using Watzap API
         """
         try:
-            from app.routes.watzap_routes import get_watzap_service
-
-            watzap_service = get_watzap_service()
+            watzap_service = self._get_watzap_service()
             if not watzap_service:
                 logger.error("❌ Watzap service not available for timeout alert")
                 return False
@@ -386,16 +650,6 @@ class TimeoutTracker:
             device_id = device_data.get('device_id', 'Unknown')
             merk = device_data.get('merk', 'Unknown')
             consecutive_timeouts = device_data.get('consecutive_timeouts', 0)
-            first_timeout = device_data.get('first_timeout', 'Unknown')
-
-            try:
-                if first_timeout != 'Unknown':
-                    first_timeout_dt = datetime.fromisoformat(first_timeout)
-                    first_timeout_formatted = first_timeout_dt.strftime('%d-%m-%Y %H:%M:%S')
-                else:
-                    first_timeout_formatted = first_timeout
-            except:
-                first_timeout_formatted = first_timeout
 
             logger.info(f"🔔 Attempting to send Watzap timeout alert for {hostname} ({ip_address})")
             logger.info(f"   Device: {device_id}, Merk: {merk}, Consecutive timeouts: {consecutive_timeouts}")
@@ -421,19 +675,22 @@ class TimeoutTracker:
             return False
 
     def _add_to_alerted_list(self, device_data: Dict):
-        """Add device to alerted_list.csv with file locking"""
+        """Add device to alerted list (in-memory + alerted_list.csv)"""
         try:
-            alerted_data = self._read_alerted_list()
             ip_address = device_data.get('ip_address')
-            if ip_address and ip_address not in alerted_data:
-                alerted_data[ip_address] = {
-                    'ip_address': ip_address,
-                    'hostname': device_data.get('hostname', ''),
-                    'device_id': device_data.get('device_id', ''),
-                }
-                # Write back to CSV using atomic write method
-                self._write_alerted_list(alerted_data)
-                logger.info(f"Added {ip_address} to alerted_list.csv")
+            # Di luar update_timeout_tracking (test alert dari route): serialisasi dengan cycle ping
+            with self._update_tracking_lock:
+                if ip_address and ip_address not in self._alerted:
+                    alerted_data = dict(self._alerted)
+                    alerted_data[ip_address] = {
+                        'ip_address': ip_address,
+                        'hostname': device_data.get('hostname', ''),
+                        'device_id': device_data.get('device_id', ''),
+                    }
+                    # Write back to CSV using atomic write method
+                    self._write_alerted_list(alerted_data)
+                    self._alerted = alerted_data
+                    logger.info(f"Added {ip_address} to alerted_list.csv")
         except Exception as e:
             logger.error(f"Error adding to alerted_list.csv: {e}")
     
@@ -442,9 +699,7 @@ class TimeoutTracker:
         Send WhatsApp recovery notification when device comes back online
         """
         try:
-            from app.routes.watzap_routes import get_watzap_service
-
-            watzap_service = get_watzap_service()
+            watzap_service = self._get_watzap_service()
             if not watzap_service:
                 logger.error("❌ Watzap service not available for recovery notification")
                 return False
@@ -455,14 +710,13 @@ class TimeoutTracker:
             consecutive_timeouts = device_data.get('consecutive_timeouts', 0)
             first_timeout = device_data.get('first_timeout', 'Unknown')
 
-            try:
-                if first_timeout != 'Unknown':
-                    first_timeout_dt = datetime.fromisoformat(first_timeout)
-                    first_timeout_formatted = format_indonesian_date(first_timeout_dt)
-                else:
-                    first_timeout_formatted = first_timeout
-            except:
-                first_timeout_formatted = first_timeout
+            # first_timeout ditulis sendiri oleh tracker (ISO); guard eksplisit untuk nilai kosong/legacy
+            first_timeout_formatted = first_timeout
+            if first_timeout and first_timeout != 'Unknown':
+                try:
+                    first_timeout_formatted = format_indonesian_date(datetime.fromisoformat(first_timeout))
+                except ValueError:
+                    pass
 
             logger.info(f"🔔 Sending recovery notification for {hostname} ({ip_address})")
             logger.info(f"   Device recovered after {consecutive_timeouts}x consecutive timeouts")
@@ -504,73 +758,61 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             logger.error(f"   Traceback: {traceback.format_exc()}")
             return False
 
-    def update_timeout_tracking(self, ping_results: List[Dict]):
+    def update_timeout_tracking(self, ping_results: List[Dict], *, now: Optional[datetime] = None):
         """
         Update timeout tracking based on ping results
         Args:
             ping_results: List of ping results from current cycle
+            now: Waktu cycle (default: datetime.now()); dipakai juga untuk snapshot analytics
         """
         # CRITICAL: Acquire lock to prevent concurrent execution
         # This prevents race condition where multiple threads modify CSV simultaneously
         with self._update_tracking_lock:
             logger.info(f"🔒 Acquired update_tracking lock - processing {len(ping_results)} ping results")
             try:
-                # Read existing timeout data
-                timeout_data = self._read_timeout_data()
-                alerted_data = self._read_alerted_list()
-                current_time = datetime.now().isoformat()
+                # Salinan state in-memory (copy-on-write: reader lain tetap melihat state lama
+                # sampai cycle ini selesai dan state baru di-swap)
+                timeout_data = dict(self._state)
+                alerted_data = dict(self._alerted)
+                initial_alerted_ips = set(alerted_data)
+                # Satu timestamp per cycle, dipakai bersama oleh timeout tracking dan analytics
+                now = now or datetime.now()
+                current_time = now.isoformat(timespec='seconds')
                 
                 # CHECKPOINT: Store initial count for validation later
                 initial_timeout_count = len(timeout_data)
                 
-                # Check if CSV file exists and has content but read returned empty
-                if os.path.exists(self.timeout_csv_path):
-                    actual_file_size = os.path.getsize(self.timeout_csv_path)
-                    if actual_file_size > 200 and len(timeout_data) == 0:
-                        logger.error(f"🚨 CSV FILE CORRUPTION DETECTED!")
-                        logger.error(f"   File exists: {self.timeout_csv_path}")
-                        logger.error(f"   File size: {actual_file_size} bytes (should have data)")
-                        logger.error(f"   But _read_timeout_data() returned: {len(timeout_data)} entries")
-                        logger.error(f"   This will cause ALL counters to reset to 1!")
+                # IP yang berubah di cycle ini (di-upsert ke SQLite)
+                changed_ips = set()
+                
+                # Agregat summary di-update per delta; max dihitung ulang hanya jika entry max pulih
+                _, agg_sum, agg_max, agg_high = self._summary_agg
+                agg_max_dirty = False
             
-                # DEBUG: Log what was read from CSV
-                logger.warning(f"📖 READ FROM CSV: {len(timeout_data)} timeout entries, {len(alerted_data)} alerted")
+                # DEBUG: Log current timeout state
+                logger.warning(f"📖 TIMEOUT STATE: {len(timeout_data)} timeout entries, {len(alerted_data)} alerted")
                 if timeout_data:
                     logger.warning(f"📋 Devices currently in timeout tracking:")
                     for ip, dev in timeout_data.items():
                         logger.warning(f"   • {dev.get('hostname')} ({ip}): {dev.get('consecutive_timeouts')}x")
                 else:
-                    logger.warning(f"   ℹ️  CSV is EMPTY - no timeout devices yet")
+                    logger.warning(f"   ℹ️  Timeout state is EMPTY - no timeout devices yet")
             
                 # Print summary at start
-                print(f"\n⏱️  Timeout Tracking Cycle - {datetime.now().strftime('%H:%M:%S')}")
+                print(f"\n⏱️  Timeout Tracking Cycle - {now.strftime('%H:%M:%S')}")
                 print(f"   📊 Status: {len(timeout_data)} device timeout, {len(alerted_data)} sudah di-alert")
                 print(f"   📊 ping_results contains: {len(ping_results)} devices")
             
-                # Store current timeout IPs for analytics
-                current_timeout_ips = set(timeout_data.keys())
-            
+                # CRITICAL FIX: Track which IPs are in current ping_results
+                # Devices NOT in ping_results should stay in timeout_data (don't remove them!)
+                # Satu set untuk deteksi duplikat sekaligus daftar IP cycle ini (tanpa pass terpisah)
                 processed_ips = set()
                 devices_to_alert = []  # Collect devices that need alerts
+                whatsapp_enabled = self.whatsapp_enabled
+                whatsapp_threshold = self.whatsapp_threshold
                 recovered_ips = []  # Track recovered devices for incident cleanup
             
-                # CRITICAL FIX: Track which IPs are in current ping_results
-                # Devices NOT in ping_results should stay in timeout_data (don't remove them!)
-                current_ping_ips = set()
-            
-                # First pass: collect all IPs in this ping cycle
-                for result in ping_results:
-                    ip = result.get('ip_address')
-                    if ip:
-                        current_ping_ips.add(ip)
-            
-                logger.info(f"🎯 Current ping cycle contains {len(current_ping_ips)} IPs")
-                if current_ping_ips and len(current_ping_ips) <= 20:
-                    logger.info(f"   IPs being pinged this cycle: {', '.join(sorted(current_ping_ips))}")
-                elif current_ping_ips:
-                    logger.info(f"   IPs being pinged this cycle: {', '.join(sorted(list(current_ping_ips)[:20]))}... (showing first 20)")
-            
-                # Second pass: process ping results
+                # Process ping results
                 for result in ping_results:
                     ip_address = result.get('ip_address')
                     ping_success = result.get('ping_success', False)
@@ -587,13 +829,16 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                         continue
                 
                     processed_ips.add(ip_address)
+                    
+                    # Satu lookup per IP; None = belum ada di timeout tracking
+                    entry = timeout_data.get(ip_address)
                 
                     if ping_success:
                         # Ping successful - remove from timeout tracking if exists
-                        if ip_address in timeout_data:
+                        if entry is not None:
                             # Log recovery
-                            consecutive_timeouts = int(timeout_data[ip_address].get('consecutive_timeouts', 0))
-                            hostname = timeout_data[ip_address].get('hostname', ip_address)
+                            consecutive_timeouts = entry['consecutive_timeouts']
+                            hostname = entry.get('hostname', ip_address)
                             was_alerted = ip_address in alerted_data
                         
                             print(f"   ✅ {hostname} ({ip_address}) pulih setelah {consecutive_timeouts}x timeout")
@@ -604,7 +849,7 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                             # Kirim notifikasi WhatsApp HANYA jika device pernah di-alert DAN mencapai threshold
                             if was_alerted and consecutive_timeouts >= self.whatsapp_threshold:
                                 print(f"      📤 Device pernah di-alert DAN ≥{self.whatsapp_threshold}x timeout, mengirim notifikasi recovery...")
-                                self._send_recovery_notification(timeout_data[ip_address])
+                                self._send_recovery_notification(entry)
                             
                                 # Hapus dari alerted_data setelah kirim recovery notification
                                 del alerted_data[ip_address]
@@ -627,6 +872,12 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                         
                             # Track recovered IP for incident cleanup
                             recovered_ips.append(ip_address)
+                            
+                            agg_sum -= consecutive_timeouts
+                            if consecutive_timeouts > HIGH_TIMEOUT_THRESHOLD:
+                                agg_high -= 1
+                            if consecutive_timeouts >= agg_max:
+                                agg_max_dirty = True
                         
                             # Hapus dari timeout_data
                             del timeout_data[ip_address]
@@ -634,47 +885,63 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                             logger.warning(f"   Reason: Ping SUCCESS - device recovered")
                     else:
                         # Ping failed - add or update timeout tracking
-                        if ip_address in timeout_data:
+                        if entry is not None:
                             # Update existing entry
-                            current_count = int(timeout_data[ip_address].get('consecutive_timeouts', 0))
+                            current_count = entry['consecutive_timeouts']
                             new_count = current_count + 1
-                            hostname = timeout_data[ip_address].get('hostname', ip_address)
+                            hostname = entry.get('hostname', ip_address)
                         
                             # DEBUG: Log before update
                             logger.warning(f"📈 INCREMENT: {hostname} ({ip_address}) {current_count}x → {new_count}x")
                             logger.warning(f"   Device WAS in timeout_data, incrementing counter")
                         
-                            timeout_data[ip_address]['consecutive_timeouts'] = str(new_count)
-                            timeout_data[ip_address]['last_timeout'] = current_time
-                            timeout_data[ip_address]['last_updated'] = current_time
+                            # Entry baru (copy-on-write), entry lama tetap utuh untuk reader state lama
+                            entry = dict(entry, consecutive_timeouts=new_count,
+                                         last_timeout=current_time, last_updated=current_time)
+                            timeout_data[ip_address] = entry
+                            changed_ips.add(ip_address)
+                            
+                            agg_sum += 1
+                            if new_count == HIGH_TIMEOUT_THRESHOLD + 1:
+                                agg_high += 1
+                            if new_count > agg_max:
+                                agg_max = new_count
                         
                             # Log timeout progression
                             is_alerted = ip_address in alerted_data
                             logger.info(f"Device {hostname} ({ip_address}) timeout count: {new_count}x (alerted: {is_alerted})")
                         
                             # Check if WhatsApp alert should be sent (pass alerted_data to avoid re-reading file)
-                            if self._should_send_whatsapp_alert(ip_address, new_count, alerted_data):
+                            # Cek murah (enabled + threshold) dulu: mayoritas device di bawah threshold
+                            # tidak perlu function call dan format log debug
+                            if (whatsapp_enabled and new_count >= whatsapp_threshold
+                                    and self._should_send_whatsapp_alert(ip_address, new_count, alerted_data)):
                                 logger.warning(f"🔔 Adding {hostname} ({ip_address}) to alert queue (timeouts: {new_count}x)")
-                                devices_to_alert.append(timeout_data[ip_address])
+                                devices_to_alert.append(entry)
                         else:
                             # Add new entry
                             hostname = result.get('hostname', ip_address)
                             logger.warning(f"🆕 NEW DEVICE: {hostname} ({ip_address}) - starting at 1x")
                             logger.warning(f"   Device NOT in timeout_data, adding as new")
-                            logger.warning(f"   timeout_data keys: {list(timeout_data.keys())[:10]}")
+                            logger.warning(f"   timeout_data keys: {list(islice(timeout_data, 10))}")
                         
-                            timeout_data[ip_address] = {
-                                'ip_address': ip_address,
-                                'hostname': result.get('hostname', ''),
-                                'device_id': str(result.get('device_id', '')),
-                                'merk': result.get('merk', ''),
-                                'os': result.get('os', ''),
-                                'kondisi': result.get('kondisi', ''),
-                                'consecutive_timeouts': '1',
-                                'first_timeout': current_time,
-                                'last_timeout': current_time,
-                                'last_updated': current_time,
-                            }
+                            entry = _NEW_ENTRY_TEMPLATE.copy()
+                            entry['ip_address'] = ip_address
+                            entry['hostname'] = result.get('hostname', '')
+                            entry['device_id'] = str(result.get('device_id', ''))
+                            entry['merk'] = result.get('merk', '')
+                            entry['os'] = result.get('os', '')
+                            entry['kondisi'] = result.get('kondisi', '')
+                            entry['consecutive_timeouts'] = 1
+                            entry['first_timeout'] = current_time
+                            entry['last_timeout'] = current_time
+                            entry['last_updated'] = current_time
+                            timeout_data[ip_address] = entry
+                            changed_ips.add(ip_address)
+                            
+                            agg_sum += 1
+                            if agg_max < 1:
+                                agg_max = 1
                             logger.info(f"Added {ip_address} to timeout tracking (first timeout)")
             
                 # Always send alerts in BATCH mode (even for single device)
@@ -724,18 +991,24 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             
                 # CHECKPOINT: Verify data integrity before preservation logic
                 logger.info(f"🔍 CHECKPOINT: Before preservation - {len(timeout_data)} devices in timeout_data")
+                logger.info(f"🎯 Current ping cycle contains {len(processed_ips)} IPs")
+                if processed_ips and len(processed_ips) <= 20:
+                    logger.info(f"   IPs being pinged this cycle: {', '.join(sorted(processed_ips))}")
+                elif processed_ips:
+                    logger.info(f"   IPs being pinged this cycle: {', '.join(sorted(islice(processed_ips, 20)))}... (showing first 20)")
             
                 # CRITICAL: Keep devices that were NOT in this ping cycle
                 # These devices are still in timeout state but weren't pinged in this cycle
                 # DO NOT remove them - they must stay until they recover (ping success)
-                devices_not_in_current_ping = set(timeout_data.keys()) - current_ping_ips
+                # Iterasi koleksi yang kecil (timeout_data), lookup O(1) ke set IP cycle ini
+                devices_not_in_current_ping = [ip for ip in timeout_data if ip not in processed_ips]
             
                 if devices_not_in_current_ping:
                     logger.warning(f"🔄 PRESERVING {len(devices_not_in_current_ping)} devices NOT in current ping cycle:")
                     for ip in devices_not_in_current_ping:
                         dev = timeout_data.get(ip, {})
                         hostname = dev.get('hostname', ip)
-                        count = dev.get('consecutive_timeouts', '0')
+                        count = dev.get('consecutive_timeouts', 0)
                         logger.warning(f"   • PRESERVE: {hostname} ({ip}): {count}x - NOT pinged this cycle, KEEPING in tracking")
                 else:
                     logger.info(f"ℹ️  All timeout devices were included in this ping cycle")
@@ -768,11 +1041,14 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                 # 2. Device tidak ada lagi di inventaris (handled by stale_ips)
             
                 # Write updated alerted_data back to CSV (includes newly alerted devices)
-                self._write_alerted_list(alerted_data)
-                logger.debug(f"Updated {len(alerted_data)} alerted devices in CSV")
+                # hanya jika isi alerted list berubah di cycle ini (device hanya ditambah/dihapus)
+                if alerted_data.keys() != initial_alerted_ips:
+                    self._write_alerted_list(alerted_data)
+                    self._alerted = alerted_data
+                    logger.debug(f"Updated {len(alerted_data)} alerted devices in CSV")
             
-                # DEBUG: Log COMPLETE data before writing to CSV
-                logger.info(f"💾 Preparing to write {len(timeout_data)} timeout entries to CSV")
+                # DEBUG: Log COMPLETE data before persisting
+                logger.info(f"💾 Preparing to persist {len(changed_ips)} changed / {len(recovered_ips)} recovered timeout entries")
             
                 # CRITICAL VALIDATION CHECKPOINT
                 # If we read data earlier but now it's empty, something is WRONG!
@@ -783,19 +1059,34 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                     logger.error(f"   All timeout data was LOST during processing!")
                     logger.error(f"   Ping results count: {len(ping_results)}")
                     logger.error(f"   This will cause counter reset bug!")
-                    logger.error(f"   Stack trace point: Before _write_timeout_data()")
+                    logger.error(f"   Stack trace point: Before _persist_changes()")
             
-                if timeout_data:
-                    logger.info(f"📋 Complete list of {len(timeout_data)} devices to be written:")
-                    for ip, dev in timeout_data.items():
-                        logger.info(f"   • {dev.get('hostname')} ({ip}): {dev.get('consecutive_timeouts')}x")
+                # Swap state lalu upsert hanya baris yang berubah; export CSV ditulis ulang
+                # oleh compact() setiap TIMEOUT_COMPACT_INTERVAL detik
+                # Network sehat (tidak ada entry ditambah/diubah/dihapus): tidak ada I/O sama sekali
+                dirty = bool(changed_ips or recovered_ips)
+                if dirty:
+                    if agg_max_dirty:
+                        agg_max = max((entry['consecutive_timeouts'] for entry in timeout_data.values()), default=0)
+                    self._state = timeout_data
+                    self._summary_agg = (len(timeout_data), agg_sum, agg_max, agg_high)
+                    pending = self._pending_changes
+                    for ip in changed_ips:
+                        pending[ip] = timeout_data[ip]
+                    for ip in recovered_ips:
+                        pending[ip] = None
                 else:
-                    logger.warning(f"⚠️  timeout_data is EMPTY - CSV will be cleared!")
-                    logger.warning(f"   If this happens repeatedly, it's the BUG causing counter resets!")
-            
-                # Write updated data back to CSV
-                self._write_timeout_data(timeout_data)
-                logger.info(f"✅ CSV write completed - {len(timeout_data)} entries written")
+                    logger.info(f"ℹ️  No timeout state change this cycle - skipping persist")
+                
+                # Debounce: commit ke SQLite paling sering sekali per persist_interval
+                if self._pending_changes and time.monotonic() - self._last_persist >= self.persist_interval:
+                    pending_count = len(self._pending_changes)
+                    if self._flush_pending_changes():
+                        logger.info(f"✅ SQLite persist completed - {pending_count} changed entries, {len(timeout_data)} entries in state")
+                
+                # Export CSV hanya jika ada perubahan sejak export terakhir
+                if self._export_dirty and time.monotonic() - self._last_compaction >= self.compact_interval:
+                    self._request_compaction()
             
                 # Check and create incidents for devices that have been down for > 1 hour
                 if self.incident_manager and timeout_data:
@@ -811,7 +1102,8 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                 updated_timeout_ips = set(timeout_data.keys())
                 self.analytics.record_timeout_snapshot(
                     timeout_data=timeout_data,
-                    previous_timeout_ips=self.previous_timeout_ips
+                    previous_timeout_ips=self.previous_timeout_ips,
+                    now=now
                 )
             
                 # Update previous timeout IPs for next cycle
@@ -822,13 +1114,13 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                 total_alerted = len(alerted_data)
             
                 if total_timeout_devices > 0:
-                    max_timeouts = max(int(entry['consecutive_timeouts']) for entry in timeout_data.values())
+                    max_timeouts = max(entry['consecutive_timeouts'] for entry in timeout_data.values())
                 
                     # Count devices near threshold
                     near_threshold = sum(1 for entry in timeout_data.values() 
-                                        if int(entry.get('consecutive_timeouts', 0)) >= (self.whatsapp_threshold - 5))
+                                        if entry['consecutive_timeouts'] >= (self.whatsapp_threshold - 5))
                     at_threshold = sum(1 for entry in timeout_data.values() 
-                                      if int(entry.get('consecutive_timeouts', 0)) >= self.whatsapp_threshold)
+                                      if entry['consecutive_timeouts'] >= self.whatsapp_threshold)
                 
                     print(f"   📊 Ringkasan: {total_timeout_devices} device timeout (max: {max_timeouts}x)")
                     print(f"   📊 Mendekati threshold (≥{self.whatsapp_threshold-5}x): {near_threshold} devices")
@@ -863,9 +1155,7 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             bool: True if successful
         """
         try:
-            from app.routes.watzap_routes import get_watzap_service
-
-            watzap_service = get_watzap_service()
+            watzap_service = self._get_watzap_service()
             if not watzap_service:
                 logger.error("❌ Watzap service not available for batch timeout alert")
                 return False
@@ -936,12 +1226,25 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             logger.error(f"   Traceback: {traceback.format_exc()}")
             return False
     
+    def get_active_count(self) -> int:
+        """Jumlah device yang sedang timeout (O(1), dari state in-memory)"""
+        return len(self._state)
+    
+    def get_timeout_entry(self, ip_address: str) -> Dict:
+        """
+        Entry timeout terkini untuk satu IP dari state in-memory (authoritative) - {} jika tidak timeout
+        Untuk pembaca di luar tracker: timeout_tracking.csv hanya export periodik dan bisa tertinggal
+        """
+        entry = self._state.get(ip_address)
+        return dict(entry) if entry is not None else {}
+    
     def get_timeout_summary(self) -> Dict:
         """Get summary statistics of timeout tracking"""
         try:
-            timeout_data = self._read_timeout_data()
+            # Agregat running (O(1)) - tidak scan state
+            count, total, max_count, high_timeout_devices = self._summary_agg
             
-            if not timeout_data:
+            if not count:
                 return {
                     'total_timeout_devices': 0,
                     'max_consecutive_timeouts': 0,
@@ -949,13 +1252,10 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
                     'devices_with_high_timeouts': 0  # > 10 consecutive
                 }
             
-            consecutive_counts = [int(entry['consecutive_timeouts']) for entry in timeout_data.values()]
-            high_timeout_devices = sum(1 for count in consecutive_counts if count > 10)
-            
             return {
-                'total_timeout_devices': len(timeout_data),
-                'max_consecutive_timeouts': max(consecutive_counts),
-                'average_consecutive_timeouts': round(sum(consecutive_counts) / len(consecutive_counts), 2),
+                'total_timeout_devices': count,
+                'max_consecutive_timeouts': max_count,
+                'average_consecutive_timeouts': round(total / count, 2),
                 'devices_with_high_timeouts': high_timeout_devices,
                 'timeout_csv_path': self.timeout_csv_path
             }
@@ -971,16 +1271,16 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             min_consecutive: Minimum consecutive timeouts to include
         """
         try:
-            timeout_data = self._read_timeout_data()
+            timeout_data = self._state
             
             filtered_devices = []
             for entry in timeout_data.values():
-                consecutive_count = int(entry.get('consecutive_timeouts', 0))
+                consecutive_count = entry['consecutive_timeouts']
                 if consecutive_count >= min_consecutive:
                     filtered_devices.append(entry)
             
             # Sort by consecutive timeouts (descending)
-            filtered_devices.sort(key=lambda x: int(x['consecutive_timeouts']), reverse=True)
+            filtered_devices.sort(key=lambda x: x['consecutive_timeouts'], reverse=True)
             
             return filtered_devices
             
@@ -989,12 +1289,18 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
             return []
     
     def cleanup_timeout_csv(self):
-        """Remove timeout CSV file (for cleanup/reset)"""
+        """Remove timeout CSV file and SQLite rows, reset in-memory state (for cleanup/reset)"""
         try:
-            if os.path.exists(self.timeout_csv_path):
-                os.remove(self.timeout_csv_path)
-                logger.info("Timeout CSV file removed")
-                self._initialize_timeout_csv()
+            with self._update_tracking_lock, self._db_lock:
+                self._state = {}
+                self._summary_agg = (0, 0, 0, 0)
+                self._pending_changes = {}
+                self._get_db().execute('DELETE FROM timeout_tracking')
+                self._export_dirty = False
+                if os.path.exists(self.timeout_csv_path):
+                    os.remove(self.timeout_csv_path)
+                    logger.info("Timeout CSV file removed")
+                    self._initialize_timeout_csv()
         except Exception as e:
             logger.error(f"Error cleaning up timeout CSV: {e}")
     
@@ -1009,7 +1315,7 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
     def export_timeout_report(self) -> Dict:
         """Export comprehensive timeout report"""
         try:
-            timeout_data = self._read_timeout_data()
+            timeout_data = self._state
             summary = self.get_timeout_summary()
             critical_devices = self.get_critical_timeouts(threshold=5)
             
@@ -1028,8 +1334,8 @@ Pesan ini dikirim otomatis oleh Sistematis Sub Reg Jawa."""
     def get_whatsapp_alert_summary(self) -> Dict:
         """Get summary of WhatsApp alerts sent"""
         try:
-            timeout_data = self._read_timeout_data()
-            alerted_data = self._read_alerted_list()
+            timeout_data = self._state
+            alerted_data = self._alerted
             
             total_alerts_sent = 0
             devices_with_alerts = []
@@ -1,5 +1,8 @@
 import requests
 import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, List, Optional
 from datetime import datetime
 import os
@@ -8,6 +11,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Broadcast dispatch configuration
+BROADCAST_MAX_WORKERS = 5  # Concurrent group sends
+BROADCAST_RATE_PER_SECOND = 50  # Max new sends started per second
+BROADCAST_MAX_RETRIES = 3  # Retries for connect errors and 5xx/429 (not API errors or read timeouts)
+BROADCAST_BACKOFF_SECONDS = 1.0  # Base delay for exponential backoff
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -28,6 +37,17 @@ def format_indonesian_date(dt: datetime) -> str:
     
     return f"{hari} {bulan} {tahun} {jam}"
 
+def _is_retryable_error(error: requests.exceptions.RequestException) -> bool:
+    """
+    Error yang aman di-retry untuk send (non-idempotent): request belum sampai server
+    (connect error) atau server menolak sementara (5xx/429). ReadTimeout TIDAK di-retry -
+    server mungkin sudah menerima POST sehingga pesan terkirim dua kali
+    """
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return True  # Termasuk ConnectTimeout
+    response = getattr(error, 'response', None)
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
 class WatzapAPI:
     """Class untuk menangani komunikasi dengan Watzap API"""
     
@@ -87,6 +107,10 @@ class WatzapAPI:
             logging.info(f"📥 Response Status Code: {response.status_code}")
             logging.info(f"   Response Body: {response.text}")
             
+            # 5xx/429: body bisa bukan JSON - jadikan HTTPError agar bisa di-retry
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            
             result = response.json()
             
             # Cek apakah response sukses
@@ -116,7 +140,8 @@ class WatzapAPI:
             return {
                 "status": "error",
                 "message": f"Gagal mengirim pesan: {str(e)}",
-                "error_detail": str(e)
+                "error_detail": str(e),
+                "retryable": _is_retryable_error(e)
             }
     
     def send_message_to_personal(self, phone_number: str, message: str) -> Dict:
@@ -177,6 +202,23 @@ class WatzapAPI:
                 "error_detail": str(e)
             }
     
+    def _send_group_with_retry(self, group_id: str, message: str) -> Dict:
+        """
+        Kirim pesan ke group dengan retry (exponential backoff + jitter)
+        Hanya connect error dan 5xx/429 yang di-retry; API error, 4xx dan read timeout langsung dikembalikan
+        """
+        for attempt in range(BROADCAST_MAX_RETRIES + 1):
+            result = self.send_message_to_group(group_id, message)
+            
+            if result["status"] == "success" or not result.get("retryable") or attempt == BROADCAST_MAX_RETRIES:
+                return result
+            
+            delay = BROADCAST_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, BROADCAST_BACKOFF_SECONDS)
+            logging.warning(f"Retry kirim ke {group_id} dalam {delay:.1f}s (attempt {attempt + 1}/{BROADCAST_MAX_RETRIES})")
+            time.sleep(delay)
+        
+        return result
+    
     def send_broadcast_to_groups(self, group_ids: List[str], message: str) -> Dict:
         """
         Broadcast pesan ke multiple WhatsApp groups
@@ -193,24 +235,34 @@ class WatzapAPI:
             "failed": []
         }
         
-        for group_id in group_ids:
-            try:
-                result = self.send_message_to_group(group_id, message)
+        if group_ids:
+            # Kirim paralel (dibatasi worker + rate) agar latency tidak O(N * RTT)
+            with ThreadPoolExecutor(max_workers=min(BROADCAST_MAX_WORKERS, len(group_ids))) as executor:
+                future_to_group = {}
+                for idx, group_id in enumerate(group_ids):
+                    if idx:
+                        time.sleep(1.0 / BROADCAST_RATE_PER_SECOND)
+                    future_to_group[executor.submit(self._send_group_with_retry, group_id, message)] = group_id
                 
-                if result["status"] == "success":
-                    results["success"].append(group_id)
-                else:
-                    results["failed"].append({
-                        "group_id": group_id,
-                        "error": result["message"]
-                    })
-                    
-            except Exception as e:
-                logging.error(f"Error broadcast ke {group_id}: {e}")
-                results["failed"].append({
-                    "group_id": group_id,
-                    "error": str(e)
-                })
+                for future in as_completed(future_to_group):
+                    group_id = future_to_group[future]
+                    try:
+                        result = future.result()
+                        
+                        if result["status"] == "success":
+                            results["success"].append(group_id)
+                        else:
+                            results["failed"].append({
+                                "group_id": group_id,
+                                "error": result["message"]
+                            })
+                            
+                    except Exception as e:
+                        logging.error(f"Error broadcast ke {group_id}: {e}")
+                        results["failed"].append({
+                            "group_id": group_id,
+                            "error": str(e)
+                        })
         
         logging.info(f"Broadcast selesai: {len(results['success'])} sukses, {len(results['failed'])} gagal")
         
@@ -17,7 +17,6 @@ import re
 import pyperclip
 import atexit
 import threading
-import csv
 from datetime import datetime
 from typing import Dict
 
@@ -504,23 +503,21 @@ Sensor Detected : Anomaly Detected"""
     return {"status": "error", "message": f"Failed to avoid mobile redirect after {max_retries} attempts"}
 
 def get_timeout_device_data(ip_address: str) -> Dict:
-    """Get device data from timeout tracking CSV"""
+    """Get device data from timeout tracking (state live tracker, fallback ke SQLite)"""
     try:
+        # timeout_tracking.csv hanya di-export periodik: pakai state tracker yang sedang berjalan
+        from app.utils.multi_ping_service import get_multi_ping_service
+        service = get_multi_ping_service()
+        if service and getattr(service, 'timeout_tracker', None):
+            return service.timeout_tracker.get_timeout_entry(ip_address)
+        
+        # Tidak ada tracker di proses ini: query langsung SQLite (authoritative), bukan CSV export
         from config import Config
         config = Config()
         timeout_dir = getattr(config, 'CSV_OUTPUT_DIR', 'ping_results')
-        timeout_csv_path = os.path.join(timeout_dir, 'timeout_tracking.csv')
-        
-        if not os.path.exists(timeout_csv_path):
-            return {}
         
-        with open(timeout_csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                if row['ip_address'] == ip_address:
-                    return dict(row)
-        
-        return {}
+        from app.utils.timeout_tracker import read_timeout_entry
+        return read_timeout_entry(timeout_dir, ip_address)
     except Exception as e:
         logging.error(f"Error getting timeout device data: {e}")
         return {}
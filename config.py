@@ -31,14 +31,44 @@ class Config:
     PING_INTERVAL = int(os.getenv('PING_INTERVAL', '5'))  # seconds
     CSV_OUTPUT_DIR = os.getenv('CSV_OUTPUT_DIR', 'ping_results')
     MAX_CSV_RECORDS = int(os.getenv('MAX_CSV_RECORDS', '1000'))  # Maximum records per CSV file
+    CSV_PRUNE_EVERY_CYCLES = int(os.getenv('CSV_PRUNE_EVERY_CYCLES', '60'))  # Compact ping CSV every N cycles
+    ENABLE_ARROW_OUTPUT = os.getenv('ENABLE_ARROW_OUTPUT', 'false').lower() == 'true'  # Also write pings_YYYYMMDD.arrow (requires pyarrow)
     
     # Multi-ping configuration
     MAX_PING_WORKERS = int(os.getenv('MAX_PING_WORKERS', '50'))  # Max concurrent ping threads
     PING_TIMEOUT = int(os.getenv('PING_TIMEOUT', '3'))  # Ping timeout in seconds
+    MIN_PING_WORKERS = int(os.getenv('MIN_PING_WORKERS', '4'))  # Lower bound for adaptive worker count
+    PING_HIGH_FAILURE_RATE = float(os.getenv('PING_HIGH_FAILURE_RATE', '0.5'))  # Halve workers above this rolling failure rate
+    DNS_CACHE_TTL = int(os.getenv('DNS_CACHE_TTL', '900'))  # Seconds to cache hostname -> IP for devices with hostnames
+    
+    # fping: re-check all failed devices with one fping process when most ping3 pings fail
+    USE_FPING_FALLBACK = os.getenv('USE_FPING_FALLBACK', 'true').lower() == 'true'
+    FPING_MASS_FAILURE_RATIO = float(os.getenv('FPING_MASS_FAILURE_RATIO', '0.5'))  # Fraction of failures that triggers the re-check
+    
+    # Async ping: system ping via asyncio subprocess instead of the thread pool (Linux)
+    USE_ASYNC_PING = os.getenv('USE_ASYNC_PING', 'false').lower() == 'true'
+    ASYNC_PING_CONCURRENCY = int(os.getenv('ASYNC_PING_CONCURRENCY', '200'))  # Max in-flight pings for icmplib / async subprocess ping
+    
+    # icmplib: ICMP sockets from one process (default when installed; unprivileged needs net.ipv4.ping_group_range)
+    USE_ICMPLIB = os.getenv('USE_ICMPLIB', 'true').lower() == 'true'
+    ICMPLIB_PRIVILEGED = os.getenv('ICMPLIB_PRIVILEGED', 'false').lower() == 'true'
+    
+    # Batch ICMP: one reused ICMP socket for all devices per cycle (Linux only)
+    USE_BATCH_ICMP_SOCKET = os.getenv('USE_BATCH_ICMP_SOCKET', 'false').lower() == 'true'
+    BATCH_ICMP_PRIVILEGED = os.getenv('BATCH_ICMP_PRIVILEGED', 'false').lower() == 'true'  # true = SOCK_RAW (root/CAP_NET_RAW)
+    
+    # Sampled ping cycles: saat cycle sebelumnya semua OK, hanya ping sebagian device
+    ENABLE_PING_SAMPLING = os.getenv('ENABLE_PING_SAMPLING', 'false').lower() == 'true'
+    PING_SAMPLE_RATIO = float(os.getenv('PING_SAMPLE_RATIO', '0.1'))  # Fraction of devices pinged in a sampled cycle
+    PING_FULL_SWEEP_EVERY = int(os.getenv('PING_FULL_SWEEP_EVERY', '10'))  # Full sweep every N cycles
     
     # Timeout tracking configuration
     ENABLE_TIMEOUT_TRACKING = os.getenv('ENABLE_TIMEOUT_TRACKING', 'true').lower() == 'true'
     TIMEOUT_CRITICAL_THRESHOLD = int(os.getenv('TIMEOUT_CRITICAL_THRESHOLD', '15'))  # Critical consecutive timeouts
+    ANALYTICS_FLUSH_EVERY = int(os.getenv('ANALYTICS_FLUSH_EVERY', '12'))  # Write buffered timeout analytics rows every N snapshots (one snapshot per ping cycle)
+    ANALYTICS_FLUSH_INTERVAL = int(os.getenv('ANALYTICS_FLUSH_INTERVAL', '60'))  # ...or once the oldest buffered row is this many seconds old
+    TIMEOUT_COMPACT_INTERVAL = int(os.getenv('TIMEOUT_COMPACT_INTERVAL', '3600'))  # Seconds between exports of the SQLite timeout state to timeout_tracking.csv
+    TIMEOUT_PERSIST_INTERVAL = int(os.getenv('TIMEOUT_PERSIST_INTERVAL', '30'))  # Commit coalesced timeout changes to SQLite at most every N seconds (0 = every cycle)
     
     # WhatsApp Alert Configuration for Timeout
     ENABLE_WHATSAPP_TIMEOUT_ALERTS = os.getenv('ENABLE_WHATSAPP_TIMEOUT_ALERTS', 'true').lower() == 'true'
@@ -52,6 +82,7 @@ class Config:
     
     # Database monitoring configuration
     DEVICE_CHECK_INTERVAL = int(os.getenv('DEVICE_CHECK_INTERVAL', '30'))  # Check database every 30 seconds
+    DEVICE_FULL_CHECK_EVERY = int(os.getenv('DEVICE_FULL_CHECK_EVERY', '20'))  # Full signature check every N checks
     
     # Shift Report Configuration
     ENABLE_SHIFT_REPORT = os.getenv('ENABLE_SHIFT_REPORT', 'true').lower() == 'true'
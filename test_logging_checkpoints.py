@@ -23,6 +23,7 @@ logging.basicConfig(
 class MockConfig:
     CSV_OUTPUT_DIR = 'ping_results'
     WHATSAPP_TIMEOUT_THRESHOLD = 5
+    TIMEOUT_PERSIST_INTERVAL = 0  # Commit ke SQLite setiap cycle agar log persist terlihat
 
 def test_logging_checkpoints():
     """Test that all logging checkpoints are present and working"""
@@ -119,12 +120,12 @@ def test_logging_checkpoints():
     print("Logging checkpoint test completed!")
     print("="*80)
     print("\nWhat to look for in logs above:")
-    print("   1. 📖 'Read from CSV' - Shows what was read")
+    print("   1. 📖 'TIMEOUT STATE' - In-memory state at cycle start")
     print("   2. 🔍 'CHECKPOINT: Before preservation' - Data count before")
     print("   3. 🔍 'CHECKPOINT: After preservation' - Data count after")
     print("   4. 🔄 'PRESERVING X devices' - Devices NOT in ping cycle")
-    print("   5. 💾 'Preparing to write' - Final data before CSV write")
-    print("   6. ✅ 'CSV write completed' - Confirmation of write")
+    print("   5. 💾 'Preparing to persist' - Changed entries before SQLite commit")
+    print("   6. ✅ 'SQLite persist completed' - Confirmation of commit")
     print("   7. 🚨 'CRITICAL BUG DETECTED' - Should NOT appear!")
     print("   8. ⚠️  'timeout_data is EMPTY' - Should NOT appear repeatedly!")
     print("\nExpected behavior:")
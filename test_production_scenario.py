@@ -6,7 +6,6 @@ This simulates the real issue where run.py sends different devices in each cycle
 
 import os
 import sys
-import csv
 import time
 from datetime import datetime
 
@@ -14,18 +13,20 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from app.utils.timeout_tracker import TimeoutTracker
+from app.utils.timeout_tracker import TimeoutTracker, read_timeout_entry
 
-def read_timeout_csv(csv_path):
-    """Read and display timeout tracking CSV"""
-    if not os.path.exists(csv_path):
-        return {}
-    
+def read_timeout_state(tracker):
+    """Read current timeout state from the tracker (timeout_tracking.csv is only a periodic export)"""
+    return {entry['ip_address']: entry for entry in tracker.get_timeout_devices()}
+
+def read_persisted_state(tracker, ips):
+    """Flush pending changes and read the given IPs back from SQLite (what survives a restart)"""
+    tracker.flush()
     data = {}
-    with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            data[row['ip_address']] = row
+    for ip in ips:
+        entry = read_timeout_entry(tracker.timeout_dir, ip)
+        if entry:
+            data[ip] = entry
     return data
 
 def main():
@@ -38,8 +39,7 @@ def main():
     config = Config()
     tracker = TimeoutTracker(config)
     
-    csv_path = tracker.timeout_csv_path
-    print(f"📁 CSV Path: {csv_path}")
+    print(f"📁 Database: {tracker.db_path}")
     print()
     
     # Multiple test devices
@@ -81,11 +81,11 @@ def main():
     
     # Clean up
     print("🧹 Cleaning up previous test data...")
-    timeout_data = tracker._read_timeout_data()
-    for ip in ['10.88.88.1', '10.88.88.2', '10.88.88.3']:
-        if ip in timeout_data:
-            del timeout_data[ip]
-    tracker._write_timeout_data(timeout_data)
+    # Ping sukses = jalur recovery normal, menghapus device dari state dan SQLite
+    stale_devices = [dict(device, ping_success=True) for device in (device_a, device_b, device_c)
+                     if tracker.get_timeout_entry(device['ip_address'])]
+    if stale_devices:
+        tracker.update_timeout_tracking(stale_devices)
     print("   ✅ Cleanup done")
     print()
     
@@ -132,7 +132,7 @@ def main():
         
         # Verify
         print(f"\n📊 Verification:")
-        timeout_data = read_timeout_csv(csv_path)
+        timeout_data = read_timeout_state(tracker)
         
         cycle_passed = True
         for device_key, expected_count in expected_counts.items():
@@ -164,7 +164,7 @@ def main():
     print("🎯 FINAL VERIFICATION")
     print("="*80)
     
-    final_data = read_timeout_csv(csv_path)
+    final_data = read_persisted_state(tracker, ['10.88.88.1', '10.88.88.2', '10.88.88.3'])
     
     print(f"\n📊 Final State:")
     for device_key in ['A', 'B', 'C']:
@@ -6,7 +6,6 @@ This simulates multiple ping cycles with the same failing device
 
 import os
 import sys
-import csv
 import time
 from datetime import datetime
 
@@ -14,19 +13,20 @@ from datetime import datetime
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from app.utils.timeout_tracker import TimeoutTracker
+from app.utils.timeout_tracker import TimeoutTracker, read_timeout_entry
 
-def read_timeout_csv(csv_path):
-    """Read and display timeout tracking CSV"""
-    if not os.path.exists(csv_path):
-        print(f"❌ CSV file not found: {csv_path}")
-        return {}
-    
+def read_timeout_state(tracker):
+    """Read current timeout state from the tracker (timeout_tracking.csv is only a periodic export)"""
+    return {entry['ip_address']: entry for entry in tracker.get_timeout_devices()}
+
+def read_persisted_state(tracker, ips):
+    """Flush pending changes and read the given IPs back from SQLite (what survives a restart)"""
+    tracker.flush()
     data = {}
-    with open(csv_path, 'r', newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            data[row['ip_address']] = row
+    for ip in ips:
+        entry = read_timeout_entry(tracker.timeout_dir, ip)
+        if entry:
+            data[ip] = entry
     return data
 
 def display_timeout_data(data):
@@ -54,8 +54,7 @@ def main():
     config = Config()
     tracker = TimeoutTracker(config)
     
-    csv_path = tracker.timeout_csv_path
-    print(f"📁 CSV Path: {csv_path}")
+    print(f"📁 Database: {tracker.db_path}")
     print()
     
     # Test device
@@ -75,10 +74,9 @@ def main():
     
     # Clean up test device if exists
     print("🧹 Cleaning up previous test data...")
-    timeout_data = tracker._read_timeout_data()
-    if test_device['ip_address'] in timeout_data:
-        del timeout_data[test_device['ip_address']]
-        tracker._write_timeout_data(timeout_data)
+    if tracker.get_timeout_entry(test_device['ip_address']):
+        # Ping sukses = jalur recovery normal, menghapus device dari state dan SQLite
+        tracker.update_timeout_tracking([dict(test_device, ping_success=True)])
         print("   ✅ Previous test data removed")
     else:
         print("   ℹ️  No previous test data")
@@ -100,7 +98,7 @@ def main():
         
         # Read and display current state
         print(f"\n📊 Current State After Cycle {cycle}:")
-        timeout_data = read_timeout_csv(csv_path)
+        timeout_data = read_timeout_state(tracker)
         display_timeout_data(timeout_data)
         
         if test_device['ip_address'] in timeout_data:
@@ -128,7 +126,7 @@ def main():
     print("🎯 FINAL VERIFICATION")
     print("="*80)
     
-    final_data = read_timeout_csv(csv_path)
+    final_data = read_persisted_state(tracker, [test_device['ip_address']])
     
     if test_device['ip_address'] in final_data:
         final_count = int(final_data[test_device['ip_address']].get('consecutive_timeouts', 0))